@@ -1,76 +1,32 @@
 
 
 import streamlit as st
-import openai
 import os
 import base64
-import pandas as pd
-from fpdf import FPDF
-
-# Set your OpenAI API key
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+import csv
+import io
+from functools import partial
+from ai_client import AIClient
+from llm_backends import LLM_BACKEND, backend_factory, default_model
+from report_renderer import render_scores_pdf
+from rubric import get_rubric
+from static_assets import logo_data_uri, style_block
+
+# LLM backend (CFED_LLM_BACKEND), created on the first AI request so the SDK import stays off the first paint
+@st.cache_resource
+def get_client():
+    return AIClient(backend_factory(LLM_BACKEND, os.getenv("OPENAI_API_KEY")))
 
 # Page configuration
 st.set_page_config(page_title="CFED AI Diagnostic Tool", layout="wide", initial_sidebar_state="expanded")
 
 # Custom CSS for styling
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@400;700&display=swap');
-    body {
-        font-family: 'Roboto', sans-serif;
-        background-color: #f5f5f5;
-    }
-    .custom-footer { 
-        position: fixed; 
-        left: 0; 
-        bottom: 0; 
-        width: 100%; 
-        background-color: #005670; 
-        color: white; 
-        text-align: center; 
-        padding: 10px; 
-        font-size: 13px; 
-    }
-    .header-bar {
-        position: fixed;
-        top: 0;
-        width: 100%;
-        background-color: #005670;
-        padding: 1em;
-        text-align: center;
-        z-index: 1000;
-    }
-    .header-bar img {
-        width: 200px;
-    }
-    .live-score {
-        position: fixed;
-        top: 120px;
-        right: 30px;
-        background-color: #ffffff;
-        border: 2px solid #005670;
-        padding: 10px;
-        border-radius: 8px;
-        z-index: 1001;
-    }
-    h1, h2, h3, h4, h5, h6 {
-        color: #005670;
-    }
-    .stButton>button {
-        background-color: #005670;
-        color: white;
-        border-radius: 5px;
-    }
-    .stButton>button:hover {
-        background-color: #003f4f;
-    }
-    </style>
+st.markdown(style_block("legacy_app") + f"""
     <div class='custom-footer'>
         © 2025 Chemonics International Inc. | Contact: Climate Finance Team
     </div>
     <div class='header-bar'>
-        <img src='https://raw.githubusercontent.com/fgaschick/cfed-ai-tool/main/Chemonics_RGB_Horizontal_BLUE-WHITE.png' alt='Chemonics Logo'/>
+        <img src='{logo_data_uri()}' alt='Chemonics Logo'/>
     </div>
     <br><br><br><br>
 """, unsafe_allow_html=True)
@@ -105,21 +61,30 @@ st.markdown("""
 # --- Helper: AI scoring function ---
 def get_ai_score(prompt, user_input):
     try:
-        # Using the correct API method for chat-based models
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Use your desired model
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_input}
-            ]
-        )
-        return response.choices[0].message.content.strip()  # Correct method to extract the response
-    except openai.OpenAIError as e:  # Catching OpenAI errors
-        if hasattr(e, 'http_status') and e.http_status == 429:
+        output = get_client().complete(default_model(), [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_input}
+        ])
+        return output.strip()
+    except Exception as e:
+        if getattr(e, "status_code", None) == 429:
             return "⚠️ Your OpenAI quota has been exceeded. Please use manual scoring."
         return f"Error from OpenAI: {e}"
-    except Exception as e:
-        return f"Unexpected error from OpenAI: {e}"
+
+# --- Manual quick check ---
+# Questions, help texts and weights come from the rubric's quick indicators
+RUBRIC = get_rubric()
+
+def quick_check_score(key):
+    dimension = RUBRIC.by_key[key]
+    answers = {}
+    for indicator in dimension.quick_indicators:
+        if indicator.choices == ["No", "Yes"]:
+            answers[indicator.id] = st.radio(indicator.label, indicator.choices, index=0, help=indicator.help)
+        else:
+            answers[indicator.id] = st.selectbox(indicator.label, indicator.choices, help=indicator.help)
+    score = RUBRIC.engine.score_dimension_quick_check(dimension.title, dimension.quick_check_values(answers))
+    return int(score) if score.is_integer() else round(score, 2)
 
 # --- Scoring Data ---
 scores_data = []
@@ -139,23 +104,7 @@ if st.checkbox("Use AI to score Enabling Environment", value=False):
             st.markdown("**AI Suggested Score and Rationale:**")
             st.markdown(result_ee)
 else:
-    has_ndc = st.radio("Has the country submitted an NDC?", ["No", "Yes"], index=0, help="NDC refers to a Nationally Determined Contribution under the Paris Agreement. This indicates whether the country has committed to climate targets.")
-    ndc_quality = st.selectbox("How ambitious is the NDC?", ["Low", "Medium", "High"], help="Refers to how clearly the NDC outlines its goals, targets, and implementation measures.")
-    has_sector_policies = st.radio("Are there sector-specific climate policies?", ["No", "Yes"], index=0, help="Considers whether climate adaptation or mitigation plans exist in key sectors such as energy, transport, agriculture, and health.")
-    has_enforcement = st.radio("Are climate laws and policies enforced predictably?", ["No", "Yes"], index=0, help="Refers to how reliably climate-related regulations and policies are applied, monitored, and enforced by government institutions.")
-    
-    enabling_score = 1
-    if has_ndc == "Yes":
-        enabling_score += 1
-        if ndc_quality == "High":
-            enabling_score += 1
-    if has_sector_policies == "Yes":
-        enabling_score += 1
-    if has_enforcement == "Yes":
-        enabling_score += 1
-    
-    enabling_score = min(enabling_score, 4)
-    scores_data.append(["Enabling Environment", enabling_score])
+    scores_data.append(["Enabling Environment", quick_check_score("env")])
 
 # --- 2. Ecosystem Infrastructure ---
 st.markdown("""
@@ -172,20 +121,7 @@ if st.checkbox("Use AI to score Ecosystem Infrastructure", value=False):
             st.markdown("**AI Suggested Score and Rationale:**")
             st.markdown(result_ei)
 else:
-    has_mrv = st.radio("Are MRV systems and climate data tools in place?", ["No", "Yes"], index=0, help="MRV refers to Monitoring, Reporting, and Verification systems that track emissions, adaptation actions, or finance flows.")
-    has_partnerships = st.radio("Are there active stakeholder networks and partnerships?", ["No", "Yes"], index=0, help="Refers to formal or informal collaboration among government, private sector, academia, and civil society on climate finance or policy.")
-    has_climate_capacity = st.radio("Do institutions have adequate climate finance capacity?", ["No", "Yes"], index=0, help="Assesses whether national or subnational institutions have technical, administrative, and financial skills to design, implement, and monitor climate finance.")
-    
-    infra_score = 1
-    if has_mrv == "Yes":
-        infra_score += 1
-    if has_partnerships == "Yes":
-        infra_score += 1
-    if has_climate_capacity == "Yes":
-        infra_score += 1
-    
-    infra_score = min(infra_score, 4)
-    scores_data.append(["Ecosystem Infrastructure", infra_score])
+    scores_data.append(["Ecosystem Infrastructure", quick_check_score("infra")])
 
 # --- 3. Finance Providers ---
 st.markdown("""
@@ -202,20 +138,7 @@ if st.checkbox("Use AI to score Finance Providers", value=False):
             st.markdown("**AI Suggested Score and Rationale:**")
             st.markdown(result_fp)
 else:
-    has_public_climate_funding = st.radio("Is there domestic public funding for climate?", ["No", "Yes"], index=0, help="Checks if the national budget or public financial institutions allocate domestic funds to climate action.")
-    has_carbon_market = st.radio("Is the country active in voluntary or compliance carbon markets?", ["No", "Yes"], index=0, help="Carbon markets enable trading of emissions reductions, including domestic or international credits.")
-    has_private_investment = st.radio("Is commercial/private capital flowing into climate sectors?", ["No", "Yes"], index=0, help="Determines whether banks, companies, or investors are financing climate-relevant activities such as renewable energy or resilience.")
-    
-    providers_score = 1
-    if has_public_climate_funding == "Yes":
-        providers_score += 1
-    if has_carbon_market == "Yes":
-        providers_score += 1
-    if has_private_investment == "Yes":
-        providers_score += 1
-    
-    providers_score = min(providers_score, 4)
-    scores_data.append(["Finance Providers", providers_score])
+    scores_data.append(["Finance Providers", quick_check_score("providers")])
 
 # --- 4. Finance Seekers ---
 st.markdown("""
@@ -232,20 +155,7 @@ if st.checkbox("Use AI to score Finance Seekers", value=False):
             st.markdown("**AI Suggested Score and Rationale:**")
             st.markdown(result_fs)
 else:
-    has_project_pipeline = st.radio("Is there a robust pipeline of fundable climate projects?", ["No", "Yes"], index=0, help="Assesses if there are well-developed, ready-to-implement projects aligned with climate goals and financing requirements.")
-    has_project_diversity = st.radio("Do projects span adaptation, mitigation, and nature-based solutions?", ["No", "Yes"], index=0, help="This means the project pipeline addresses multiple themes: climate adaptation, emission reductions, and ecosystem-based solutions.")
-    inclusive_targeting = st.radio("Are vulnerable or underserved groups targeted in project design?", ["No", "Yes"], index=0, help="Considers whether projects prioritize or include groups such as women, youth, Indigenous Peoples, or the poor, who are disproportionately affected by climate change.")
-    
-    seekers_score = 1
-    if has_project_pipeline == "Yes":
-        seekers_score += 1
-    if has_project_diversity == "Yes":
-        seekers_score += 1
-    if inclusive_targeting == "Yes":
-        seekers_score += 1
-    
-    seekers_score = min(seekers_score, 4)
-    scores_data.append(["Finance Seekers", seekers_score])
+    scores_data.append(["Finance Seekers", quick_check_score("seekers")])
 
 # --- Results Section ---
 st.markdown("---")
@@ -255,11 +165,11 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-score_df = pd.DataFrame(scores_data, columns=["Dimension", "Score"])
-if not score_df.empty:
-    st.dataframe(score_df, use_container_width=True)
-st.markdown(f"<div class='live-score'>🧮 <strong>Live Maturity Score:</strong> {round(score_df['Score'].mean(), 2)}/4</div>", unsafe_allow_html=True)
-total_average = round(score_df["Score"].mean(), 2)
+score_rows = [{"Dimension": dimension, "Score": score} for dimension, score in scores_data]
+if score_rows:
+    st.dataframe(score_rows, use_container_width=True)
+total_average = round(sum(score for _, score in scores_data) / len(scores_data), 2) if scores_data else float("nan")
+st.markdown(f"<div class='live-score'>🧮 <strong>Live Maturity Score:</strong> {total_average}/4</div>", unsafe_allow_html=True)
 st.markdown(f"### 🧮 Average Ecosystem Maturity Score: {total_average}/4")
 
 st.markdown("**Suggested Actions:**")
@@ -271,51 +181,22 @@ else:
     st.success("Strong ecosystem: Prioritize scaling solutions, regional leadership, and blended finance innovation.")
 
 # --- Downloadable CSV ---
-csv = score_df.to_csv(index=False)
-b64_csv = base64.b64encode(csv.encode()).decode()
+csv_buffer = io.StringIO()
+csv_writer = csv.writer(csv_buffer, lineterminator="\n")
+csv_writer.writerow(["Dimension", "Score"])
+csv_writer.writerows(scores_data)
+b64_csv = base64.b64encode(csv_buffer.getvalue().encode()).decode()
 href_csv = f'<a href="data:file/csv;base64,{b64_csv}" download="cfed_scores.csv">📥 Download scores as CSV</a>'
 st.markdown(href_csv, unsafe_allow_html=True)
 
 # --- Downloadable PDF ---
-pdf = FPDF()
-pdf.add_page()
-logo_file = "Chemonics_RGB_Horizontal_BLUE-WHITE.png"
-pdf.image(logo_file, x=10, y=8, w=50)
-pdf.set_font("Arial", size=12)
-pdf.ln(30)
-pdf.cell(200, 10, txt="CFED Maturity Assessment Summary", ln=True, align="C")
-pdf.ln(10)
-for index, row in score_df.iterrows():
-    pdf.cell(200, 10, txt=f"{row['Dimension']}: {row['Score']}/4", ln=True)
-pdf.ln(10)
-pdf.cell(200, 10, txt=f"Average Maturity Score: {total_average}/4", ln=True)
-pdf.ln(20)
-pdf.set_font("Arial", style="I", size=11)
-pdf.multi_cell(0, 10, "Climate Finance Team\nChemonics International\n2025")
-pdf_output = "cfed_scores.pdf"
-pdf.output(pdf_output)
-with open(pdf_output, "rb") as pdf_file:
-    b64_pdf = base64.b64encode(pdf_file.read()).decode()
-    href_pdf = f'<a href="data:application/pdf;base64,{b64_pdf}" download="cfed_scores.pdf">📄 Download scores as PDF</a>'
-st.markdown(href_pdf, unsafe_allow_html=True)
+# Rendered in memory only when the button is clicked, and memoized on the scores
+st.download_button("📄 Download scores as PDF", data=partial(render_scores_pdf, tuple(scores_data), total_average),
+                   file_name="cfed_scores.pdf", mime="application/pdf")
 
 st.markdown("---")
 st.caption("Prototype built for CFED AI tool – All Four Dimensions. To view a walkthrough of how to use this tool, visit: https://cfed-tool-guide.streamlit.app. For definitions, see the CFED Glossary.")
-st.markdown("""
-<style>
-.sticky-footer {
-  position: fixed;
-  bottom: 0;
-  width: 100%;
-  background-color: #005670;
-  color: white;
-  text-align: center;
-  padding: 10px;
-  font-size: 13px;
-  z-index: 1000;
-}
-</style>
-<div class='sticky-footer'>
+st.markdown(style_block("legacy_footer") + """<div class='sticky-footer'>
   © 2025 Chemonics International Inc. | Contact: Climate Finance Team
 </div>
 """, unsafe_allow_html=True)
@@ -1,108 +1,339 @@
 import streamlit as st 
-from openai import OpenAI
 import os
-import base64
-import pandas as pd
-from fpdf import FPDF
-import PyPDF2
-import docx
-from io import BytesIO
-import re
+import hashlib
+import json
 import time
+import uuid
+from functools import partial
+from ai_cache import ResponseCache
+from ai_client import AIClient, RateLimiter, RequestCoalescer
+from assessment_store import AssessmentStore
+from cfed_scoring import (DIMENSIONS, RUBRIC, Scorer, StructuredOutputError, assess_all_input, assess_all_prompt,
+                          combined_tier, extract_avg_score, format_recommendations, format_structured_score, is_ai_error,
+                          maturity_band, recommendation_prompt)
+from chunking import count_tokens, dimension_token_budget, prepare_reduce
+import metrics
+from llm_backends import LLM_BACKEND, backend_factory, default_model, model_routes_from_env, needs_api_key
+from job_queue import JobQueue
+from evidence_compression import compress_evidence
+from evidence_index import RETRIEVAL_MIN_TOKENS, RETRIEVAL_TOKENS, SUBCOMPONENT_QUERIES, EvidenceIndex
+from static_assets import logo_bytes, style_block
+from report_renderer import render_recommendations_pdf
+from text_extraction import extract_texts
+
+# Heavy dependencies (openai, numpy, PyPDF2, fpdf) are imported by the modules above only inside
+# the functions that use them, so the first paint never waits for them.
+# benchmarks/bench_startup.py reports which of them a run has loaded.
 
 # Set OpenAI API key using environment variable
+# CFED_LLM_BACKEND selects openai (default), local (an OpenAI-compatible endpoint) or mock
 api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
+if not api_key and needs_api_key(LLM_BACKEND):
     st.error("OPENAI_API_KEY environment variable not set.")
     st.session_state.selected_tab = "Instructions"
     st.stop()
 
-client = OpenAI(api_key=api_key)
-
-# AI scoring function
-def get_ai_score(prompt, user_input):
+# How often pages waiting on background AI jobs check for results
+JOB_POLL_SECONDS = float(os.getenv("CFED_JOB_POLL_SECONDS", "1.5"))
+# How often output streamed by a running job is redrawn; only polled while that job is running
+JOB_STREAM_POLL_SECONDS = float(os.getenv("CFED_JOB_STREAM_POLL_SECONDS", "0.25"))
+# Set CFED_ADMIN_PANEL=1 to show per-stage timings, tokens and cost in the sidebar
+ADMIN_PANEL = os.getenv("CFED_ADMIN_PANEL", "") == "1"
+
+# Prometheus metrics on CFED_METRICS_PORT, started once per process
+@st.cache_resource
+def get_metrics_server(port):
+    return metrics.start_metrics_server(port)
+
+if metrics.METRICS_PORT:
+    get_metrics_server(metrics.METRICS_PORT)
+
+# Process-wide response cache shared by every session and rerun.
+# Set CFED_AI_CACHE_DB to a file path to keep responses across restarts.
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(
+        max_entries=int(os.getenv("CFED_AI_CACHE_SIZE", "256")),
+        db_path=os.getenv("CFED_AI_CACHE_DB") or None
+    )
+
+# One OpenAI client, connection pool, rate limiter and in-flight request table per process.
+# Every session shares them, so concurrent users reuse warm connections, are throttled
+# together and send identical requests once.
+@st.cache_resource
+def get_ai_client(backend, api_key):
+    limiter = RateLimiter(
+        requests_per_minute=int(os.getenv("CFED_AI_RPM", "0")),
+        tokens_per_minute=int(os.getenv("CFED_AI_TPM", "0"))
+    )
+    # The backend is built on the first AI call, keeping the SDK import off the first paint
+    return AIClient(backend_factory(backend, api_key), limiter, RequestCoalescer())
+
+# Resolved once per run so worker threads never touch the Streamlit runtime
+response_cache = get_response_cache()
+ai_client = get_ai_client(LLM_BACKEND, api_key)
+
+EMBEDDING_MODEL = os.getenv("CFED_EMBEDDING_MODEL", "text-embedding-3-small")
+
+def embed_texts(texts):
+    with metrics.ai_call("embedding", EMBEDDING_MODEL):
+        return ai_client.embed(EMBEDDING_MODEL, texts)
+
+# One evidence index per process, shared by all dimension tabs and sessions
+@st.cache_resource
+def get_evidence_index():
+    return EvidenceIndex(embed_texts, EMBEDDING_MODEL, backend=LLM_BACKEND)
+
+evidence_index = get_evidence_index()
+
+# CFED_AI_MODEL and CFED_AI_MODEL_<ROLE> choose the model for each dimension and for recommendations
+scorer = Scorer(ai_client, response_cache, default_model(), model_routes_from_env())
+get_ai_score = scorer.get_ai_score
+stream_ai_score = scorer.stream_ai_score
+
+# Uploaded documents are tracked per dimension, keyed by content hash, so each file
+# is parsed once and never folded into the narrative text itself.
+# New files from one upload are extracted in parallel. Files taken out of the uploader are
+# detached again, and files removed with the Remove button stay removed while they remain in
+# the uploader; documents restored from a saved assessment were never in it and are kept.
+def attach_documents(key, uploaded_files):
+    documents = st.session_state.dimension_documents.setdefault(key, {})
+    removed = st.session_state.removed_digests.setdefault(key, set())
+    new_files = {}
+    current = set()
+    for uploaded_file in uploaded_files:
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        current.add(digest)
+        if digest not in documents and digest not in removed:
+            new_files.setdefault(digest, uploaded_file)
+    for digest in st.session_state.uploaded_digests.get(key, set()) - current:
+        documents.pop(digest, None)
+    # A removed file that is uploaded again later is attached again
+    removed &= current
+    st.session_state.uploaded_digests[key] = current
+    if not new_files:
+        return
+    with st.spinner(f"Reading {len(new_files)} document(s)..."):
+        results = extract_texts(new_files.values())
+    for (digest, uploaded_file), (text, error) in zip(new_files.items(), results):
+        if error is not None:
+            st.error(f"{uploaded_file.name}: {error}")
+            continue
+        # Page furniture, whitespace and repeated paragraphs are dropped before the text is stored
+        text, stats = compress_evidence(text)
+        documents[digest] = {"name": uploaded_file.name, "text": text, "tokens": stats.tokens_after,
+                             "raw_tokens": stats.tokens_before}
+
+# Large evidence packs are reduced to the passages relevant to the given subcomponent queries.
+# Runs inside the AI jobs, since indexing embeds every new document; returns the evidence and
+# a warning if retrieval failed and the full documents are sent instead.
+def retrieve_evidence(job, documents, queries, token_budget=RETRIEVAL_TOKENS):
+    evidence = [doc["text"] for doc in documents.values()]
+    if sum(doc["tokens"] for doc in documents.values()) > RETRIEVAL_MIN_TOKENS:
+        try:
+            job.progress = "_Indexing documents..._"
+            for digest, doc in documents.items():
+                evidence_index.add_document(digest, doc["text"])
+            evidence = evidence_index.retrieve(list(documents), queries, token_budget=token_budget)
+        except Exception as e:
+            return evidence, f"Evidence retrieval unavailable, sending full documents instead: {e}"
+        finally:
+            job.progress = ""
+    return evidence, None
+
+# Assemble the AI input from the narrative plus each attached document exactly once
+def build_ai_input(job, narrative, documents, key=None):
+    with metrics.stage("prompt_assembly", dimension=key, documents=len(documents)) as fields:
+        evidence, warning = (retrieve_evidence(job, documents, SUBCOMPONENT_QUERIES[key]) if key in SUBCOMPONENT_QUERIES
+                             else ([doc["text"] for doc in documents.values()], None))
+        parts = [narrative] + evidence
+        ai_input = "\n\n".join(part for part in parts if part)
+        fields["tokens"] = count_tokens(ai_input)
+    return ai_input, warning
+
+# Identifies a dimension's AI inputs, so a tab can tell whether the combined assessment still applies
+def input_signature(key):
+    narrative = st.session_state.dimension_inputs.get(f"text_{key}", "")
+    digests = sorted(st.session_state.dimension_documents.get(key, {}))
+    return hashlib.sha256("\n".join([narrative] + digests).encode("utf-8")).hexdigest()
+
+# Dimensions with a narrative or documents; the combined assessment leaves the others alone
+def assessable_dimensions():
+    return [(title, key) for title, key, _ in DIMENSIONS
+            if st.session_state.dimension_inputs.get(f"text_{key}", "").strip() or st.session_state.dimension_documents.get(key)]
+
+# Narratives and documents of the given (title, key) dimensions for the combined assessment.
+# Documents attached to several dimensions are sent once.
+def assess_all_sources(dimensions):
+    narratives = {title: st.session_state.dimension_inputs.get(f"text_{key}", "") for title, key in dimensions}
+    documents = {}
+    for _, key in dimensions:
+        documents.update(st.session_state.dimension_documents.get(key, {}))
+    return narratives, documents
+
+# Input for the combined assessment; retrieval covers the subcomponents of every dimension in it
+def build_assess_all_input(job, narratives, documents, keys):
+    queries = [query for key in keys for query in SUBCOMPONENT_QUERIES[key]]
+    with metrics.stage("prompt_assembly", dimension="combined", documents=len(documents)) as fields:
+        evidence, warning = retrieve_evidence(job, documents, queries, token_budget=RETRIEVAL_TOKENS * len(keys))
+        ai_input = assess_all_input(narratives, evidence)
+        fields["tokens"] = count_tokens(ai_input)
+    return ai_input, warning
+
+# Background AI jobs, shared by every session. Jobs run on worker threads, so the functions
+# below only use the process-wide scorer and return plain results; apply_job copies a finished
+# result into the session that asked for it.
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+jobs = get_job_queue()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+def job_key(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+# Evidence retrieval runs here, off the script thread. Long inputs are scored chunk by chunk
+# first; streamed output is published as job progress.
+def scoring_job(job, title, prompt, key, narrative, documents, structured):
+    ai_input, warning = build_ai_input(job, narrative, documents, key)
+    final_prompt, final_input = prepare_reduce(prompt, ai_input, partial(get_ai_score, role=key),
+                                               token_budget=dimension_token_budget(key), structured=structured)
+    if is_ai_error(final_input):
+        return {"status": "ai_error", "output": final_input, "warning": warning}
+    if structured:
+        try:
+            output = format_structured_score(scorer.get_structured_score(title, final_prompt, final_input))
+        except StructuredOutputError as e:
+            return {"status": "ai_error" if is_ai_error(str(e)) else "invalid", "output": str(e), "warning": warning}
+    else:
+        parts = []
+        for delta in stream_ai_score(final_prompt, final_input, role=key):
+            parts.append(delta)
+            job.progress = "".join(parts)
+        output = "".join(parts).strip()
+    if is_ai_error(output):
+        return {"status": "ai_error", "output": output, "warning": warning}
+    return {"status": "ok", "output": output, "score": extract_avg_score(output, title), "warning": warning}
+
+def recommendation_job(job, dim, score):
+    parts = []
+    for delta in stream_ai_score(recommendation_prompt(dim, score), "", role="recommendations"):
+        parts.append(delta)
+        job.progress = "".join(parts)
+    return {"score": score, "output": "".join(parts).strip()}
+
+# Score every dimension and write its recommendations in one structured request
+def assess_all_job(job, narratives, documents, keys, signatures):
+    titles = list(signatures)
+    ai_input, warning = build_assess_all_input(job, narratives, documents, keys)
+    prompt, user_input = prepare_reduce(assess_all_prompt(titles), ai_input, partial(get_ai_score, role="combined"),
+                                        token_budget=dimension_token_budget(*keys), structured=True)
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_input}
-            ]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"AI error: {str(e)}"
-
-# More reliable score extraction
-def extract_avg_score(output):
-    score_lines = re.findall(r"\(\d\)\s*[^:\n]+:\s*(\d)", output)
-    scores = [int(s) for s in score_lines if s.isdigit()]
-    if scores:
-        return round(sum(scores) / len(scores), 2)
-    return None
-
-# Function to extract text from uploaded file
-def extract_text_from_file(uploaded_file):
-    text = ""
-    if uploaded_file.type == "application/pdf":
-        pdf_reader = PyPDF2.PdfReader(uploaded_file)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        doc = docx.Document(uploaded_file)
-        for para in doc.paragraphs:
-            text += para.text
-    return text
-
-# PDF generation
-def generate_pdf_from_recommendations(recommendations):
-    def safe_latin1(text):
-        return text.encode('latin1', 'replace').decode('latin1')
-
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt="AI-Based Recommendations for Action", ln=True, align="C")
-    pdf.ln(10)
-    for recommendation in recommendations:
-        pdf.multi_cell(0, 10, safe_latin1(recommendation))
-    pdf_bytes = pdf.output(dest='S').encode('latin1', 'replace')
-    return BytesIO(pdf_bytes)
+        if is_ai_error(user_input):
+            raise StructuredOutputError(user_input)
+        results = scorer.assess_all(prompt, user_input, titles)
+    except StructuredOutputError as e:
+        return {"status": "ai_error" if is_ai_error(str(e)) else "invalid", "output": str(e), "warning": warning}
+    return {"status": "ok", "results": results, "signatures": signatures, "warning": warning}
+
+# Copy a finished job's result into session state, once per job unless forced (a tab showing
+# the result applies it again, as a manual score may have replaced it since)
+def apply_job(slot, job, force=False):
+    applied = st.session_state.setdefault("applied_jobs", {})
+    if not job.done or job.exception() is not None or (applied.get(slot) == job.id and not force):
+        return
+    applied[slot] = job.id
+    result = job.result()
+    kind, _, name = slot.partition(":")
+    if kind == "score" and result["status"] == "ok":
+        title = next(title for title, key, _ in DIMENSIONS if key == name)
+        if result["score"] is not None:
+            st.session_state.ai_outputs[title] = result["output"]
+            st.session_state.dimension_scores[title] = result["score"]
+        else:
+            st.session_state.dimension_scores[title] = 2
+    elif kind == "recommendation" and not is_ai_error(result["output"]):
+        st.session_state.recommendations[name] = (result["score"], f"### {name}\n{result['output']}")
+    elif kind == "assess_all":
+        st.session_state.assess_all_message = result
+        if result["status"] == "ok":
+            # Only the dimensions that were assessed; the others keep their scores
+            for title, dimension in result["results"].items():
+                st.session_state.dimension_scores[title] = dimension["average"]
+                st.session_state.ai_outputs[title] = format_structured_score(dimension)
+                # Stored with the score they were written for, so the Summary tab reuses them without calling the AI
+                st.session_state.recommendations[title] = (dimension["average"], f"### {title}\n{format_recommendations(dimension['recommendations'])}")
+                st.session_state.assessed_all[title] = result["signatures"][title]
+
+def apply_finished_jobs():
+    for slot, job in jobs.session_jobs(session_id).items():
+        apply_job(slot, job)
+
+# Drop this session's job slots so old results are not applied again after a reset or load
+def release_jobs():
+    for slot in jobs.session_jobs(session_id):
+        jobs.release(session_id, slot)
+    st.session_state.pop("applied_jobs", None)
+
+# Assessments are persisted to SQLite so work survives resets, refreshes and restarts
+@st.cache_resource
+def get_assessment_store():
+    return AssessmentStore(os.getenv("CFED_ASSESSMENT_DB", "cfed_assessments.sqlite3"))
+
+assessment_store = get_assessment_store()
+COMPLETION_FLAGS = ["env_done", "infra_done", "providers_done", "seekers_done"]
+
+def current_assessment_state():
+    inputs = dict(st.session_state.dimension_inputs)
+    inputs.update({flag: st.session_state.get(flag, False) for flag in COMPLETION_FLAGS})
+    return {
+        "inputs": inputs,
+        "scores": st.session_state.dimension_scores,
+        "documents": st.session_state.dimension_documents,
+        "ai_outputs": st.session_state.ai_outputs,
+        "recommendations": st.session_state.recommendations
+    }
+
+def load_assessment(assessment):
+    state = assessment_store.load(assessment["id"])
+    # Drop widget state so checkboxes are rebuilt from the loaded values
+    for name in list(st.session_state.dimension_inputs) + list(state["inputs"]):
+        st.session_state.pop(name, None)
+    for flag in COMPLETION_FLAGS:
+        st.session_state.pop(f"{flag}_box", None)
+        st.session_state[flag] = state["inputs"].pop(flag, False)
+    st.session_state.dimension_inputs = state["inputs"]
+    st.session_state.dimension_scores.update(state["scores"])
+    st.session_state.dimension_documents = state["documents"]
+    st.session_state.ai_outputs = state["ai_outputs"]
+    st.session_state.recommendations = state["recommendations"]
+    st.session_state.assessed_all = {}
+    st.session_state.uploaded_digests = {}
+    st.session_state.removed_digests = {}
+    release_jobs()
+    st.session_state.assessment = assessment
 
 # Streamlit UI setup
 st.set_page_config(page_title="Climate Finance Maturity Tool", layout="wide")
-st.sidebar.image("https://raw.githubusercontent.com/fgaschick/cfed-ai-tool/main/Chemonics_RGB_Horizontal_BLUE-WHITE.png", use_container_width=True)
-st.sidebar.markdown("""
-<style>
-[data-testid="stSidebar"] > div:first-child {
-    background-color: #005670;
-    padding-top: 1rem;
-    color: white;
-}
-[data-testid="stSidebar"] * {
-    color: white !important;
-}
-section.main label span,
-section.main div[class^="st"] label span,
-section.main input[type="checkbox"] + div div,
-section.main input[type="radio"] + div div {
-    color: black !important;
-}
-</style>
-""", unsafe_allow_html=True)
+st.sidebar.image(logo_bytes(), use_container_width=True)
+st.sidebar.markdown(style_block("sidebar_theme"), unsafe_allow_html=True)
 st.sidebar.title("Climate Finance Ecosystem Diagnostic (CFED)")
 st.sidebar.subheader("AI-Assisted Maturity Scoring Tool")
 
 # Handle early reset before anything renders
 if "reset_triggered" in st.session_state and st.session_state.reset_triggered:
     st.session_state.dimension_inputs = {}
-    st.session_state.dimension_scores = {
-        "Enabling Environment": 0,
-        "Ecosystem Infrastructure": 0,
-        "Finance Providers": 0,
-        "Finance Seekers": 0
-    }
+    st.session_state.dimension_documents = {}
+    st.session_state.ai_outputs = {}
+    st.session_state.recommendations = {}
+    st.session_state.assessed_all = {}
+    st.session_state.uploaded_digests = {}
+    st.session_state.removed_digests = {}
+    release_jobs()
+    # Detach from the saved assessment so the reset does not overwrite it
+    st.session_state.pop("assessment", None)
+    st.session_state.dimension_scores = {title: 0 for title, _, _ in DIMENSIONS}
     st.session_state.selected_tab = "Instructions"
     st.session_state.reset_triggered = False
     for flag in ["env_done", "infra_done", "providers_done", "seekers_done"]:
@@ -111,38 +342,95 @@ if "reset_triggered" in st.session_state and st.session_state.reset_triggered:
 
 # Reset and session state setup
 if "dimension_scores" not in st.session_state:
-    st.session_state.dimension_scores = {
-        "Enabling Environment": 0,
-        "Ecosystem Infrastructure": 0,
-        "Finance Providers": 0,
-        "Finance Seekers": 0
-    }
+    st.session_state.dimension_scores = {title: 0 for title, _, _ in DIMENSIONS}
 if "dimension_inputs" not in st.session_state:
     st.session_state.dimension_inputs = {}
+if "dimension_documents" not in st.session_state:
+    st.session_state.dimension_documents = {}
+if "ai_outputs" not in st.session_state:
+    st.session_state.ai_outputs = {}
+if "recommendations" not in st.session_state:
+    st.session_state.recommendations = {}
+if "assessed_all" not in st.session_state:
+    st.session_state.assessed_all = {}
+if "uploaded_digests" not in st.session_state:
+    st.session_state.uploaded_digests = {}
+if "removed_digests" not in st.session_state:
+    st.session_state.removed_digests = {}
 if "reset_triggered" not in st.session_state:
     st.session_state.reset_triggered = False
 
-st.sidebar.markdown("""
-<style>
-section[data-testid="stSidebar"] button {
-    color: #2196F3 !important;
-    border: 1px solid #2196F3 !important;
-    background-color: transparent !important;
-}
-section[data-testid="stSidebar"] button:hover {
-    background-color: #e3f2fd !important;
-    color: #1565c0 !important;
-    border-color: #1565c0 !important;
-}
-</style>
-""", unsafe_allow_html=True)
+# Results of background jobs that finished since the last run
+apply_finished_jobs()
+
+st.sidebar.markdown(style_block("sidebar_buttons"), unsafe_allow_html=True)
 
 if st.sidebar.button("🔁 Reset All Inputs"):
     st.session_state.reset_triggered = True
     st.rerun()
 
+with st.sidebar.expander("💾 Saved Assessments"):
+    active_assessment = st.session_state.get("assessment")
+    if active_assessment:
+        st.caption(f"Changes are saved to {active_assessment['country']} – version {active_assessment['version']}.")
+    country = st.text_input("Country", value=active_assessment["country"] if active_assessment else "")
+    if st.button("Save as new version", disabled=not country.strip()):
+        assessment_id, version = assessment_store.create_assessment(country.strip())
+        st.session_state.assessment = {"id": assessment_id, "country": country.strip(), "version": version}
+        assessment_store.save(assessment_id, current_assessment_state())
+        st.rerun()
+    saved_assessments = assessment_store.list_assessments()
+    if saved_assessments:
+        chosen = st.selectbox(
+            "Load a saved assessment", saved_assessments,
+            format_func=lambda a: f"{a['country']} – v{a['version']} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(a['updated_at']))})"
+        )
+        if st.button("Load"):
+            load_assessment(chosen)
+            st.rerun()
+
+assessable = assessable_dimensions()
+if st.sidebar.button("⚡ Assess all dimensions with AI", disabled=not assessable or jobs.get(session_id, "assess_all") is not None,
+                     help="Scores every dimension with a narrative or documents and writes their recommendations in a "
+                          "single AI request. Dimensions without either keep their current scores."):
+    narratives, documents = assess_all_sources(assessable)
+    signatures = {title: input_signature(key) for title, key in assessable}
+    # Keyed on the inputs' signatures; evidence retrieval happens inside the job
+    jobs.submit(session_id, "assess_all", job_key("assess_all", scorer.model_for("combined"), signatures),
+                assess_all_job, narratives, documents, [key for _, key in assessable], signatures)
+
+assess_all_message = st.session_state.pop("assess_all_message", None)
+if assess_all_message:
+    # Shown once; releasing the slot lets the button start a fresh assessment
+    jobs.release(session_id, "assess_all")
+    if assess_all_message.get("warning"):
+        st.sidebar.warning(assess_all_message["warning"])
+    if assess_all_message["status"] == "ok":
+        st.sidebar.success(f"Scored {', '.join(assess_all_message['results'])}.")
+    elif assess_all_message["status"] == "ai_error":
+        st.sidebar.error("The AI service could not be reached after several retries. Please try again shortly.")
+    else:
+        st.sidebar.error(f"The AI reply did not match the scoring schema: {assess_all_message['output']}")
+else:
+    assess_all_state = jobs.get(session_id, "assess_all")
+    if assess_all_state is not None and assess_all_state.exception() is not None:
+        jobs.release(session_id, "assess_all")
+        st.sidebar.error(f"The combined assessment failed: {assess_all_state.exception()}")
+
+# Polls while this session has AI jobs in flight and reruns the page when they finish
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def background_jobs_status():
+    running = jobs.running(session_id)
+    if not running:
+        st.rerun()
+    st.caption(f"⏳ {len(running)} AI job(s) running in the background. You can keep working meanwhile.")
+
+if jobs.running(session_id):
+    with st.sidebar:
+        background_jobs_status()
+
 # Tab setup
-tabs = ["Instructions", "Enabling Environment", "Ecosystem Infrastructure", "Finance Providers", "Finance Seekers"]
+tabs = ["Instructions"] + [title for title, _, _ in DIMENSIONS]
 if all(st.session_state.get(done_flag, False) for done_flag in ["env_done", "infra_done", "providers_done", "seekers_done"]):
     tabs.append("Summary & Recommendations")
 if not all(st.session_state.get(done_flag, False) for done_flag in ["env_done", "infra_done", "providers_done", "seekers_done"]):
@@ -182,13 +470,43 @@ if selected_tab == "Instructions":
 
 # Colored score display
 def get_colored_score(score):
-    if score <= 1:
-        return f"<span style='color:#e57373; font-weight:bold;'>{score}</span>", "Nascent – Early-stage systems with significant gaps."
-    elif score == 2:
-        return f"<span style='color:#fdd835; font-weight:bold;'>{score}</span>", "Emerging – Some key structures exist, but inconsistent or weak."
-    elif score >= 3:
-        return f"<span style='color:#81c784; font-weight:bold;'>{score}</span>", "Mature – Robust, inclusive, and sustainable systems in place."
-    return str(score), "Unknown maturity"
+    _, label, color, description = maturity_band(score)
+    return f"<span style='color:{color}; font-weight:bold;'>{score}</span>", f"{label} – {description}"
+
+# Streamed output of a running scoring job; reruns the page once the job has finished
+@st.fragment(run_every=JOB_STREAM_POLL_SECONDS)
+def scoring_progress(slot):
+    job = jobs.get(session_id, slot)
+    if job is None or job.done:
+        st.rerun()
+    if job.progress:
+        st.markdown(job.progress)
+    st.caption(f"⏳ Analyzing with AI ({time.time() - job.submitted:.0f}s). You can work on other dimensions meanwhile.")
+
+def show_scoring_result(slot, job):
+    apply_job(slot, job, force=True)
+    if job.exception() is not None:
+        st.error(f"Scoring failed: {job.exception()}")
+        result = {"status": "failed"}
+    else:
+        result = job.result()
+    if result.get("warning"):
+        st.warning(result["warning"])
+    if result["status"] == "ai_error":
+        # The previous score is kept rather than substituting a default for a failed call
+        st.markdown(result["output"])
+        st.error("The AI service could not be reached after several retries. Please try again shortly.")
+    elif result["status"] == "invalid":
+        # Keep the previous score; the reply failed validation even after the repair attempt
+        st.error(f"The AI reply did not match the scoring schema: {result['output']}")
+    elif result["status"] == "ok":
+        st.markdown(result["output"])
+        if result["score"] is None:
+            st.warning("Could not extract scores. Defaulting to 2.")
+        return
+    if st.button("Try again", key=f"retry_{slot}"):
+        jobs.forget(job.key)
+        st.rerun()
 
 # Dimension Tabs (Reusing your existing scoring logic placeholder here)
 # AI/Manual scoring tab function
@@ -197,79 +515,62 @@ def ai_scoring_tab(title, prompt, key):
     use_ai = st.checkbox(f"Use AI to score {title}", value=False, key=f"ai_{key}")
     if use_ai:
         narrative = st.session_state.dimension_inputs.setdefault(f"text_{key}", "")
-        narrative_help_text = {
-            "env": "Describe national climate strategies, policy commitments, financing targets, and stakeholder consultation practices.",
-            "infra": "Describe physical infrastructure, climate data systems, digital platforms, and regulatory frameworks supporting climate goals.",
-            "providers": "Describe the role and engagement of public, private, DFI, and multilateral actors in providing climate finance.",
-            "seekers": "Describe quality of project proposals, project pipelines, accessibility of finance, and stakeholder inclusion in project development."
-        }
-        narrative = st.text_area("Enter narrative description:", height=300, value=narrative, help=narrative_help_text.get(key, "Provide relevant information."))
+        dimension = RUBRIC.by_key[key]
+        narrative = st.text_area("Enter narrative description:", height=300, value=narrative, help=dimension.narrative_help or "Provide relevant information.")
         st.session_state.dimension_inputs[f"text_{key}"] = narrative
-        upload_help_text = {
-            "env": "Upload relevant documents such as NDCs, national climate policies, and climate finance strategies.",
-            "infra": "Upload documents such as infrastructure assessments, digital platform documentation, or data monitoring reports.",
-            "providers": "Upload reports showing participation of public/private finance institutions or MDB/DFI engagement.",
-            "seekers": "Upload project concept notes, funding proposals, or stakeholder engagement reports."
-        }
-        uploaded_file = st.file_uploader("Upload document (PDF/DOCX)", type=["pdf", "docx"], key=f"file_{key}", help=upload_help_text.get(key, "Upload supporting evidence."))
-        if uploaded_file:
-            file_text = extract_text_from_file(uploaded_file)
-            narrative += file_text
-            st.session_state.dimension_inputs[f"text_{key}"] = narrative
-        if narrative:
-            with st.spinner("Analyzing with AI..."):
-                output = get_ai_score(prompt, narrative)
-                st.markdown("**AI-Generated Output:**")
-                st.markdown(output)
-                avg_score = extract_avg_score(output)
-                if avg_score is not None:
-                    st.session_state.dimension_scores[title] = avg_score
-                else:
-                    st.warning("Could not extract scores. Defaulting to 2.")
-                    st.session_state.dimension_scores[title] = 2
+        structured = st.toggle("Structured scoring (validated JSON per subcomponent)", value=True, key=f"structured_{key}",
+                               help="Scores each subcomponent through a fixed JSON schema instead of reading scores from free text.")
+        uploaded_files = st.file_uploader("Upload documents (PDF/DOCX)", type=["pdf", "docx"], key=f"file_{key}",
+                                          accept_multiple_files=True, help=dimension.upload_help or "Upload supporting evidence.")
+        attach_documents(key, uploaded_files or [])
+        documents = st.session_state.dimension_documents.get(key, {})
+        for digest, doc in list(documents.items()):
+            doc_col, remove_col = st.columns([5, 1])
+            saved = 1 - doc["tokens"] / doc["raw_tokens"] if doc.get("raw_tokens") else 0
+            doc_col.caption(f"📄 {doc['name']} – {len(doc['text']):,} characters"
+                            + (f", {doc['tokens']:,} tokens after removing {saved:.0%} as page furniture or duplicates" if saved > 0 else ""))
+            if remove_col.button("Remove", key=f"remove_{key}_{digest[:12]}"):
+                del documents[digest]
+                st.session_state.removed_digests.setdefault(key, set()).add(digest)
+                st.rerun()
+        if st.session_state.assessed_all.get(title) == input_signature(key) and title in st.session_state.ai_outputs:
+            # Already scored by the combined assessment and the inputs have not changed since
+            st.markdown("**AI-Generated Output** (from the combined assessment):")
+            st.markdown(st.session_state.ai_outputs[title])
+            # The manual score may have replaced it while the AI checkbox was off
+            score = extract_avg_score(st.session_state.ai_outputs[title], title)
+            if score is not None:
+                st.session_state.dimension_scores[title] = score
+            return
+        if narrative or documents:
+            # Scored in the background, so other tabs stay usable and reruns do not restart the call.
+            # Keyed on the inputs' signature; evidence retrieval happens inside the job.
+            slot = f"score:{key}"
+            job = jobs.submit(session_id, slot, job_key("score", scorer.model_for(key), structured, prompt, input_signature(key)),
+                              scoring_job, title, prompt, key, narrative, dict(documents), structured)
+            st.markdown("**AI-Generated Output:**")
+            if job.done:
+                show_scoring_result(slot, job)
+            else:
+                scoring_progress(slot)
     else:
         st.markdown("### Manual Scoring (based on sub-indicator evidence)")
+        # Indicators, their help texts and weights come from the rubric
+        dimension = RUBRIC.by_title[title]
         checkbox_list = []
-
-        if title == "Enabling Environment":
-            keys_labels = [
-                (f"{key}_env_s1", "Country has submitted an NDC", "The country has formally submitted its Nationally Determined Contribution to the UNFCCC."),
-                (f"{key}_env_s2", "NDC is linked to investment or implementation plans", "The NDC includes clear links to how implementation or financing will be achieved."),
-                (f"{key}_env_s3", "NDC or strategy includes financing targets or mechanisms", "The document outlines financial goals, instruments, or specific funding mechanisms."),
-                (f"{key}_env_s4", "There is a national climate finance strategy or roadmap", "A dedicated national plan or roadmap guides domestic and international climate finance efforts.")
-            ]
-        elif title == "Ecosystem Infrastructure":
-            keys_labels = [
-                (f"{key}_infra_s1", "Physical infrastructure for climate adaptation and mitigation exists", "Infrastructure such as sea walls, renewable energy plants, or forest buffers are operational."),
-                (f"{key}_infra_s2", "There is a national or regional data infrastructure for monitoring climate impacts", "Data systems exist to track climate vulnerabilities, emissions, or adaptation needs."),
-                (f"{key}_infra_s3", "Climate-related digital platforms are available for stakeholders", "Platforms share climate data or facilitate finance access for implementers."),
-                (f"{key}_infra_s4", "Regulatory frameworks for climate finance and development are in place", "Climate finance and low-carbon development are supported by enforceable regulations.")
-            ]
-        elif title == "Finance Providers":
-            keys_labels = [
-                (f"{key}_prov_s1", "Public finance providers are operational and engaged in climate finance", "Government ministries or national funds disburse climate-targeted finance."),
-                (f"{key}_prov_s2", "Private finance providers are actively engaged in climate finance", "Commercial banks or private investors participate in climate-aligned investments."),
-                (f"{key}_prov_s3", "Development finance institutions provide substantial climate finance", "Institutions like regional or bilateral DFIs fund adaptation or mitigation projects."),
-                (f"{key}_prov_s4", "Multilateral development banks are active in the climate finance ecosystem", "MDBs such as the World Bank or ADB provide loans or grants for climate action.")
-            ]
-        elif title == "Finance Seekers":
-            keys_labels = [
-                (f"{key}_seek_s1", "Project proposals are well developed and aligned with climate finance needs", "Proposals are technically sound and reflect country or sectoral climate goals."),
-                (f"{key}_seek_s2", "A pipeline of climate projects is available for financing", "There is a prioritized list of climate projects ready for donor or investor review."),
-                (f"{key}_seek_s3", "There is easy access to finance for climate-related projects", "Barriers to entry for communities or local governments are minimal."),
-                (f"{key}_seek_s4", "Stakeholder engagement is integral to project development", "Project beneficiaries are consulted and reflected in design and implementation.")
-            ]
-
-        for k, label, tip in keys_labels:
+        for indicator in dimension.indicators:
+            k = f"{key}_{indicator.id}"
             st.session_state.dimension_inputs.setdefault(k, False)
-            val = st.checkbox(label, value=st.session_state.dimension_inputs[k], key=k, help=tip)
+            val = st.checkbox(indicator.label, value=st.session_state.dimension_inputs[k], key=k, help=indicator.help)
             st.session_state.dimension_inputs[k] = val
             checkbox_list.append(val)
 
-        score = sum([int(bool(x)) for x in checkbox_list])
+        score = RUBRIC.engine.score_dimension_indicators(title, checkbox_list)
+        # Whole-number weights give whole scores, shown as before without a decimal point
+        score = int(score) if score.is_integer() else round(score, 2)
         st.session_state.dimension_scores[title] = score
         colored_score, maturity_label = get_colored_score(score)
-        st.markdown(f"**Score for {title}:** {colored_score}/4 – _{maturity_label}_", unsafe_allow_html=True)
+        st.markdown(f"**Score for {title}:** {colored_score}/{dimension.max_indicator_score:g} – _{maturity_label}_", unsafe_allow_html=True)
 
         flag_map = {
             "env": "env_done",
@@ -292,33 +593,66 @@ completion_flags = {
     "Finance Seekers": "seekers_done"
 }
 
-if selected_tab == "Enabling Environment":
-    ai_scoring_tab("Enabling Environment", "You are a climate finance expert. Assess the enabling environment using: (1) Strategy, (2) Policy, (3) Enforcement, (4) Stakeholder consultation. Assign a score 0–3 for each.", "env")
-elif selected_tab == "Ecosystem Infrastructure":
-    ai_scoring_tab("Ecosystem Infrastructure", "You are a climate finance expert. Assess infrastructure: (1) Physical, (2) Data, (3) Digital platforms, (4) Regulatory frameworks.", "infra")
-elif selected_tab == "Finance Providers":
-    ai_scoring_tab("Finance Providers", "You are a climate finance expert. Assess: (1) Public, (2) Private, (3) DFIs, (4) MDBs. Score 0–3.", "providers")
-elif selected_tab == "Finance Seekers":
-    ai_scoring_tab("Finance Seekers", "You are a climate finance expert. Assess: (1) Proposals, (2) Pipeline, (3) Access to finance, (4) Stakeholder engagement.", "seekers")
+for title, key, prompt in DIMENSIONS:
+    if selected_tab == title:
+        ai_scoring_tab(title, prompt, key)
+
+# Each target's stored recommendation, or the progress or error of the job writing it
+def render_recommendations(targets):
+    stored_recommendations = st.session_state.recommendations
+    for dim, score in targets:
+        stored = stored_recommendations.get(dim)
+        if stored and stored[0] == score:
+            st.markdown(stored[1])
+            continue
+        job = jobs.get(session_id, f"recommendation:{dim}")
+        if job is None:
+            continue
+        if job.exception() is not None:
+            st.error(f"Recommendations for {dim} failed: {job.exception()}")
+        else:
+            st.markdown(f"### {dim}\n{job.result()['output'] if job.done else job.progress}")
+
+@st.fragment(run_every=JOB_STREAM_POLL_SECONDS)
+def recommendations_progress(targets):
+    render_recommendations(targets)
+    if all(job.done for job in jobs.session_jobs(session_id).values()):
+        st.rerun()
 
 # Summary & Recommendations tab
 if selected_tab == "Summary & Recommendations":
     st.title("Summary & Recommendations")
-    recommendations = []
-    for dim, score in st.session_state.dimension_scores.items():
-        if score < 4:
-            rec_prompt = f"Provide 3–5 recommendations for improving {dim} with a current score of {score}."
-            ai_output = str(get_ai_score(rec_prompt, "")).strip()
-            recommendations.append(f"### {dim}\n{ai_output}")
-
-    if not recommendations:
-        st.info("All dimensions scored high. No improvement recommendations necessary.")
+    # Recommendations are kept per dimension with the score they were generated for,
+    # so reruns only call the AI again when a score has changed
+    stored_recommendations = st.session_state.setdefault("recommendations", {})
+    targets = [(dim, score) for dim, score in st.session_state.dimension_scores.items() if score < 4]
+    failed = []
+    for dim, score in targets:
+        stored = stored_recommendations.get(dim)
+        if not (stored and stored[0] == score):
+            # Background jobs, one per dimension, run concurrently and outlive this run
+            slot = f"recommendation:{dim}"
+            job = jobs.submit(session_id, slot, job_key("recommendation", scorer.model_for("recommendations"), dim, score),
+                              recommendation_job, dim, score)
+            apply_job(slot, job)
+            if job.done and (job.exception() is not None or is_ai_error(job.result()["output"])):
+                failed.append(job)
+    if any(not job.done for job in jobs.session_jobs(session_id).values()):
+        recommendations_progress(tuple(targets))
     else:
-        for rec in recommendations:
-            st.markdown(rec)
+        render_recommendations(targets)
+    if failed and st.button("Retry failed recommendations"):
+        for job in failed:
+            jobs.forget(job.key)
+        st.rerun()
+
+    recommendations = [stored_recommendations[dim][1] for dim, _ in targets if dim in stored_recommendations]
+    if not targets:
+        st.info("All dimensions scored high. No improvement recommendations necessary.")
     if recommendations:
-        pdf_output = generate_pdf_from_recommendations(recommendations)
-        st.download_button("Download PDF", data=pdf_output, file_name="recommendations.pdf", mime="application/pdf")
+        # The PDF is only rendered when the user clicks the button
+        st.download_button("Download PDF", data=partial(render_recommendations_pdf, tuple(recommendations)),
+                           file_name="recommendations.pdf", mime="application/pdf")
 
 # Sidebar scores overview
 st.sidebar.markdown("## Scores Overview")
@@ -326,34 +660,33 @@ for dim, score in st.session_state.dimension_scores.items():
     colored, _ = get_colored_score(score)
     st.sidebar.markdown(f"**{dim}**: {colored}/4", unsafe_allow_html=True)
 
-combined_score = round(sum(st.session_state.dimension_scores.values()) / 4, 2)
-tier = "Low"
-color = "#e57373"
-if combined_score >= 2.5:
-    tier = "High"
-    color = "#81c784"
-elif combined_score >= 1.5:
-    tier = "Medium"
-    color = "#fdd835"
+combined_score = round(RUBRIC.combine(st.session_state.dimension_scores), 2)
+_, tier, color = combined_tier(combined_score)
 st.sidebar.markdown(f"**Combined Score**: <span style='color:{color}'>{combined_score}/4 – {tier} Maturity</span>", unsafe_allow_html=True)
+st.sidebar.caption(f"AI response cache: {response_cache.hits()} hits / {response_cache.misses()} misses")
+
+if ADMIN_PANEL:
+    with st.sidebar.expander("📊 Metrics (all sessions)"):
+        role_rows, stage_rows = metrics.summary()
+        for heading, rows in [("AI calls by role", role_rows), ("Stages", stage_rows)]:
+            st.markdown(f"**{heading}**")
+            if rows:
+                st.dataframe(rows, hide_index=True)
+            else:
+                st.caption("Nothing recorded yet.")
+        evidence_tokens = {labels["state"]: value for labels, value in metrics.REGISTRY.counter_values("cfed_evidence_tokens_total")}
+        if evidence_tokens.get("extracted"):
+            st.caption(f"Evidence tokens: {evidence_tokens['extracted']:,} extracted, {evidence_tokens['compressed']:,} kept "
+                       f"({1 - evidence_tokens['compressed'] / evidence_tokens['extracted']:.0%} saved)")
+        if metrics.METRICS_PORT:
+            st.caption(f"Prometheus metrics: port {metrics.METRICS_PORT}, path /metrics")
+
+# Incremental save: only fields that changed since the last run are written
+if st.session_state.get("assessment"):
+    assessment_store.save(st.session_state.assessment["id"], current_assessment_state())
 
 # Footer
-st.markdown("""
-<style>
-.footer-fixed {
-    position: fixed;
-    bottom: 0;
-    left: 0;
-    width: 100vw;
-    background-color: #005670;
-    color: white;
-    text-align: center;
-    padding: 10px;
-    font-size: 13px;
-    z-index: 1000;
-}
-</style>
-<div class='footer-fixed'>
+st.markdown(style_block("footer") + """<div class='footer-fixed'>
     © 2025 Chemonics International Inc. | Contact: Climate Finance Team
 </div>
 """, unsafe_allow_html=True)
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import current_ai_call
+
+# Resilient wrapper around the OpenAI client: a shared token-bucket rate limiter,
+# exponential backoff with jitter on 429/5xx responses, and coalescing of identical
+# in-flight requests so concurrent sessions asking the same question share one call.
+# The openai SDK is slow to import, so it is only loaded when the first client is built.
+
+RETRYABLE_STATUS = {408, 409, 429}
+# Rough size of a completion, used to reserve tokens-per-minute capacity before a call
+COMPLETION_TOKEN_ESTIMATE = 500
+CHARS_PER_TOKEN = 4
+
+# Connection pool for the process-wide OpenAI client; idle connections are kept alive
+# so consecutive calls skip the TCP and TLS handshake
+HTTP_POOL_SIZE = int(os.getenv("CFED_HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("CFED_HTTP_KEEPALIVE_SECONDS", "60"))
+
+
+# Retries are left to AIClient, so the SDK's own retry loop is disabled
+def create_openai_client(api_key, pool_size=HTTP_POOL_SIZE, keepalive_expiry=HTTP_KEEPALIVE_SECONDS, **kwargs):
+    import httpx
+    import openai
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=keepalive_expiry
+    )
+    return openai.OpenAI(api_key=api_key, max_retries=0, http_client=openai.DefaultHttpxClient(limits=limits), **kwargs)
+
+
+def is_retryable(error):
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages):
+    return sum(len(m["content"]) for m in messages) // CHARS_PER_TOKEN + COMPLETION_TOKEN_ESTIMATE
+
+
+def request_key(model, payload):
+    return hashlib.sha256(json.dumps([model, payload], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Two token buckets (requests/min and tokens/min); 0 disables a bucket
+class RateLimiter:
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    # Block until one request and `tokens` tokens are available, then take them
+    def acquire(self, tokens=0):
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = (1 - self._requests) * 60 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            time.sleep(wait)
+
+
+# Identical calls made while one is already running wait for that call's result
+class RequestCoalescer:
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def run(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+# `client` is an OpenAI client, or a zero-argument factory that builds one on first use
+class AIClient:
+    def __init__(self, client, limiter=None, coalescer=None, max_retries=5, base_delay=1.0, max_delay=30.0):
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.limiter = limiter or RateLimiter()
+        self.coalescer = coalescer or RequestCoalescer()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    @property
+    def client(self):
+        if callable(self._client):
+            with self._client_lock:
+                if callable(self._client):
+                    self._client = self._client()
+        return self._client
+
+    def _delay(self, attempt, error):
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter: spreads retries from concurrent sessions instead of synchronising them
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call(self, fn, tokens):
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self._delay(attempt, e))
+                attempt += 1
+                self.retries += 1
+                call = current_ai_call()
+                if call is not None:
+                    call.retries += 1
+
+    # Chat completion text; identical concurrent requests share one API call
+    def complete(self, model, messages, **kwargs):
+        def call():
+            response = self._call(
+                lambda: self.client.chat.completions.create(model=model, messages=messages, **kwargs),
+                estimate_tokens(messages)
+            )
+            # Usage is attributed to the caller that made the request, not to coalesced waiters
+            call = current_ai_call()
+            if call is not None:
+                call.add_usage(getattr(response, "usage", None))
+            return response.choices[0].message.content
+        return self.coalescer.run(request_key(model, [messages, kwargs]), call)
+
+    # Streamed chat completion; retries cover opening the stream, not a stream cut off midway.
+    # The last chunk carries token usage and has no choices.
+    def stream(self, model, messages, **kwargs):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        return self._call(
+            lambda: self.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs),
+            estimate_tokens(messages)
+        )
+
+    def embed(self, model, inputs):
+        def call():
+            response = self._call(
+                lambda: self.client.embeddings.create(model=model, input=inputs),
+                sum(len(text) for text in inputs) // CHARS_PER_TOKEN
+            )
+            call = current_ai_call()
+            if call is not None:
+                call.add_usage(getattr(response, "usage", None))
+            return [item.embedding for item in response.data]
+        return self.coalescer.run(request_key(model, inputs), call)
@@ -0,0 +1,199 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# SQLite persistence for assessments.
+# Each assessment is one (country, version) with its input fields, attached documents,
+# AI outputs and scores in separate tables. save() compares the state with what was last
+# written for that assessment and only touches rows that changed.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    country TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (country, version)
+);
+CREATE TABLE IF NOT EXISTS fields (
+    assessment_id INTEGER NOT NULL REFERENCES assessments (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (assessment_id, name)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    assessment_id INTEGER NOT NULL REFERENCES assessments (id) ON DELETE CASCADE,
+    dimension TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    name TEXT NOT NULL,
+    text BLOB NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (assessment_id, dimension, digest)
+);
+CREATE TABLE IF NOT EXISTS ai_outputs (
+    assessment_id INTEGER NOT NULL REFERENCES assessments (id) ON DELETE CASCADE,
+    dimension TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    score REAL,
+    output TEXT NOT NULL,
+    PRIMARY KEY (assessment_id, dimension, kind)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    assessment_id INTEGER NOT NULL REFERENCES assessments (id) ON DELETE CASCADE,
+    dimension TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (assessment_id, dimension)
+);
+"""
+
+
+def empty_state():
+    return {"inputs": {}, "scores": {}, "documents": {}, "ai_outputs": {}, "recommendations": {}}
+
+
+# Flatten a state dict into {(table, key...): value} rows so two states can be diffed
+def _rows(state):
+    rows = {}
+    for name, value in state.get("inputs", {}).items():
+        rows[("fields", name)] = json.dumps(value)
+    for dimension, score in state.get("scores", {}).items():
+        rows[("scores", dimension)] = score
+    for dimension, documents in state.get("documents", {}).items():
+        for digest, doc in documents.items():
+            # Document text never changes for a given hash, so the name is enough to compare
+            rows[("documents", dimension, digest)] = doc["name"]
+    for dimension, output in state.get("ai_outputs", {}).items():
+        rows[("ai_outputs", dimension, "score")] = (None, output)
+    for dimension, (score, text) in state.get("recommendations", {}).items():
+        rows[("ai_outputs", dimension, "recommendation")] = (score, text)
+    return rows
+
+
+class AssessmentStore:
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # Last state written per assessment, used to compute incremental saves
+        self._synced = {}
+
+    def create_assessment(self, country):
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT MAX(version) FROM assessments WHERE country = ?", (country,)).fetchone()
+            version = (row[0] or 0) + 1
+            cursor = self._db.execute(
+                "INSERT INTO assessments (country, version, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (country, version, now, now)
+            )
+            self._synced[cursor.lastrowid] = {}
+            return cursor.lastrowid, version
+
+    def list_assessments(self, country=None):
+        query = "SELECT id, country, version, created_at, updated_at FROM assessments"
+        params = ()
+        if country:
+            query += " WHERE country = ?"
+            params = (country,)
+        query += " ORDER BY country, version DESC"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [dict(zip(("id", "country", "version", "created_at", "updated_at"), row)) for row in rows]
+
+    # Every assessment with its dimension scores in one query, as (id, country, version,
+    # created_at, updated_at, dimension, score) rows; assessments without scores have a None dimension
+    def score_rows(self, country=None):
+        query = """
+            SELECT a.id, a.country, a.version, a.created_at, a.updated_at, s.dimension, s.score
+            FROM assessments a LEFT JOIN scores s ON s.assessment_id = a.id
+        """
+        params = ()
+        if country:
+            query += " WHERE a.country = ?"
+            params = (country,)
+        with self._lock:
+            return self._db.execute(query, params).fetchall()
+
+    def save(self, assessment_id, state):
+        rows = _rows(state)
+        with self._lock:
+            previous = self._synced.get(assessment_id)
+            if previous is None:
+                previous = _rows(self._load(assessment_id))
+            changed = {key: value for key, value in rows.items() if previous.get(key) != value}
+            removed = [key for key in previous if key not in rows]
+            if not changed and not removed:
+                return 0
+            with self._db:
+                for key in removed:
+                    self._delete(assessment_id, key)
+                for key, value in changed.items():
+                    self._upsert(assessment_id, key, value, state)
+                self._db.execute("UPDATE assessments SET updated_at = ? WHERE id = ?", (time.time(), assessment_id))
+            self._synced[assessment_id] = rows
+            return len(changed) + len(removed)
+
+    def load(self, assessment_id):
+        with self._lock:
+            state = self._load(assessment_id)
+            self._synced[assessment_id] = _rows(state)
+            return state
+
+    # Caller must hold self._lock
+    def _load(self, assessment_id):
+        state = empty_state()
+        for name, value in self._db.execute("SELECT name, value FROM fields WHERE assessment_id = ?", (assessment_id,)):
+            state["inputs"][name] = json.loads(value)
+        for dimension, score in self._db.execute("SELECT dimension, score FROM scores WHERE assessment_id = ?", (assessment_id,)):
+            state["scores"][dimension] = score
+        for dimension, digest, name, text, tokens in self._db.execute(
+                "SELECT dimension, digest, name, text, tokens FROM documents WHERE assessment_id = ?", (assessment_id,)):
+            state["documents"].setdefault(dimension, {})[digest] = {
+                "name": name, "text": zlib.decompress(text).decode("utf-8"), "tokens": tokens
+            }
+        for dimension, kind, score, output in self._db.execute(
+                "SELECT dimension, kind, score, output FROM ai_outputs WHERE assessment_id = ?", (assessment_id,)):
+            if kind == "recommendation":
+                state["recommendations"][dimension] = (score, output)
+            else:
+                state["ai_outputs"][dimension] = output
+        return state
+
+    def _delete(self, assessment_id, key):
+        table, *parts = key
+        if table == "fields":
+            self._db.execute("DELETE FROM fields WHERE assessment_id = ? AND name = ?", (assessment_id, parts[0]))
+        elif table == "scores":
+            self._db.execute("DELETE FROM scores WHERE assessment_id = ? AND dimension = ?", (assessment_id, parts[0]))
+        elif table == "documents":
+            self._db.execute("DELETE FROM documents WHERE assessment_id = ? AND dimension = ? AND digest = ?",
+                             (assessment_id, parts[0], parts[1]))
+        elif table == "ai_outputs":
+            self._db.execute("DELETE FROM ai_outputs WHERE assessment_id = ? AND dimension = ? AND kind = ?",
+                             (assessment_id, parts[0], parts[1]))
+
+    def _upsert(self, assessment_id, key, value, state):
+        table, *parts = key
+        if table == "fields":
+            self._db.execute("INSERT OR REPLACE INTO fields (assessment_id, name, value) VALUES (?, ?, ?)",
+                             (assessment_id, parts[0], value))
+        elif table == "scores":
+            self._db.execute("INSERT OR REPLACE INTO scores (assessment_id, dimension, score) VALUES (?, ?, ?)",
+                             (assessment_id, parts[0], value))
+        elif table == "documents":
+            doc = state["documents"][parts[0]][parts[1]]
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (assessment_id, dimension, digest, name, text, tokens) VALUES (?, ?, ?, ?, ?, ?)",
+                (assessment_id, parts[0], parts[1], doc["name"], zlib.compress(doc["text"].encode("utf-8")), doc.get("tokens", 0))
+            )
+        elif table == "ai_outputs":
+            score, output = value
+            self._db.execute(
+                "INSERT OR REPLACE INTO ai_outputs (assessment_id, dimension, kind, score, output) VALUES (?, ?, ?, ?, ?)",
+                (assessment_id, parts[0], parts[1], score, output)
+            )
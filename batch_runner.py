@@ -0,0 +1,413 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import partial
+
+import metrics
+from ai_cache import ResponseCache
+from ai_client import HTTP_POOL_SIZE, AIClient, RateLimiter
+from cfed_scoring import (DIMENSIONS, RUBRIC, Scorer, StructuredOutputError, assess_all_input, assess_all_prompt,
+                          extract_avg_score, format_recommendations, format_structured_score, is_ai_error,
+                          recommendation_prompt)
+from chunking import dimension_token_budget, map_reduce_score, prepare_reduce
+from evidence_compression import compress_evidence
+from llm_backends import (BACKENDS, LLM_BACKEND, LLM_BASE_URL, backend_factory, default_model, model_routes_from_env,
+                          needs_api_key)
+from text_extraction import LocalFile, extract_texts
+
+# Headless assessment runner: scores every dimension and its recommendations for many
+# countries without the Streamlit UI.
+#
+# Input is either a manifest (JSON list) of
+#     {"country": "Kenya", "narratives": {"env": "..."}, "documents": {"env": ["ndc.pdf"], "all": ["strategy.pdf"]}}
+# or a directory with one folder per country containing <dimension key>.txt narratives,
+# <dimension key>/ folders of documents for that dimension and an optional shared/ folder
+# of documents used for every dimension. Dimension keys are env, infra, providers, seekers.
+#
+#     python batch_runner.py countries/ --output scores.csv --workers 4 --rpm 60
+#
+# With --assess-all each country is scored in one structured request covering every dimension
+# that has a narrative or documents, and their recommendations, with shared documents sent once.
+#
+# With --indicators the input is instead a CSV of manual assessments: a country column and
+# one column per rubric indicator id (1/0, yes/no or a fraction met). Every row is scored
+# through the rubric's scoring engine in one pass, without AI calls.
+#
+#     python batch_runner.py indicators.csv --indicators --output manual_scores.csv
+
+DIMENSION_KEYS = [key for _, key, _ in DIMENSIONS]
+SHARED_DOCUMENTS = "all"
+DOCUMENT_EXTENSIONS = (".pdf", ".docx")
+RESULT_COLUMNS = ["country", "dimension", "score", "subcomponents", "ai_output", "recommendations", "error"]
+# Error of a dimension with nothing to assess: a final outcome rather than a failure
+NO_INPUT = "no narrative or documents"
+
+
+def _list_documents(folder):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(DOCUMENT_EXTENSIONS)
+    )
+
+
+# Read a country directory tree into the manifest format
+def load_directory(root):
+    countries = []
+    for country in sorted(os.listdir(root)):
+        folder = os.path.join(root, country)
+        if not os.path.isdir(folder):
+            continue
+        narratives = {}
+        documents = {SHARED_DOCUMENTS: _list_documents(os.path.join(folder, "shared"))}
+        for key in DIMENSION_KEYS:
+            narrative_path = os.path.join(folder, f"{key}.txt")
+            if os.path.exists(narrative_path):
+                with open(narrative_path, encoding="utf-8") as f:
+                    narratives[key] = f.read()
+            documents[key] = _list_documents(os.path.join(folder, key))
+        countries.append({"country": country, "narratives": narratives, "documents": documents})
+    return countries
+
+
+def load_manifest(path):
+    if os.path.isdir(path):
+        return load_directory(path)
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        countries = json.load(f)
+    # Document paths in a manifest are relative to the manifest file
+    for entry in countries:
+        entry.setdefault("narratives", {})
+        entry["documents"] = {
+            key: [os.path.join(base, p) for p in paths]
+            for key, paths in entry.get("documents", {}).items()
+        }
+    return countries
+
+
+def _empty_row(country, dimension):
+    return {"country": country, "dimension": dimension, "score": None, "subcomponents": "",
+            "ai_output": "", "recommendations": "", "error": ""}
+
+
+# (country, dimension) results are appended as JSON lines, so an interrupted run picks up
+# where it stopped. Scored rows whose recommendations failed are kept too, so a rerun only
+# retries the recommendations.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        self.results[(row["country"], row["dimension"])] = row
+
+    def done(self, country, dimension):
+        row = self.results.get((country, dimension))
+        return row is not None and (not row["error"] or row["error"] == NO_INPUT)
+
+    # A scored row for the dimension whose recommendations still need to be written, or None
+    def pending_recommendations(self, country, dimension):
+        row = self.results.get((country, dimension))
+        return row if row is not None and row["error"] and row["score"] is not None else None
+
+    # Rows worth keeping: final outcomes, and scores whose recommendations failed
+    @staticmethod
+    def keeps(row):
+        return not row["error"] or row["error"] == NO_INPUT or row["score"] is not None
+
+    def record(self, row):
+        with self._lock:
+            self.results[(row["country"], row["dimension"])] = row
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+# Every document of a country, once each, shared documents first
+def _document_paths(entry):
+    return list(dict.fromkeys(path for key in [SHARED_DOCUMENTS] + DIMENSION_KEYS for path in entry["documents"].get(key, [])))
+
+
+# Rate limiting, retries and request coalescing are handled by the scorer's AIClient
+class BatchRunner:
+    def __init__(self, scorer, structured=False, assess_all=False):
+        self.scorer = scorer
+        self.structured = structured
+        self.assess_all = assess_all
+        # One future per file: the first task to need a file reads it, concurrent tasks wait for it
+        self._text_cache = {}
+        self._text_lock = threading.Lock()
+
+    # Compressed texts of the given files in order; files not read yet are extracted in parallel
+    def document_texts(self, paths):
+        owned = {}
+        with self._text_lock:
+            for path in dict.fromkeys(paths):
+                if path not in self._text_cache:
+                    self._text_cache[path] = owned[path] = Future()
+            futures = {path: self._text_cache[path] for path in paths}
+        try:
+            for path, (text, error) in zip(owned, extract_texts(LocalFile(path) for path in owned)):
+                if error is not None:
+                    owned[path].set_exception(error)
+                else:
+                    owned[path].set_result(compress_evidence(text)[0])
+        finally:
+            # Never leave other tasks waiting on a file this call failed to read
+            for future in owned.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("document extraction did not complete"))
+        return [futures[path].result() for path in paths]
+
+    # Drop cached texts no longer needed by any pending country
+    def release_texts(self, paths):
+        with self._text_lock:
+            for path in paths:
+                self._text_cache.pop(path, None)
+
+    def assess_dimension(self, entry, title, key, prompt, scored=None):
+        if scored is not None:
+            # Scored by an earlier run; only the recommendations are retried
+            return self.add_recommendations(dict(scored, error=""), title)
+        row = _empty_row(entry["country"], title)
+        paths = entry["documents"].get(SHARED_DOCUMENTS, []) + entry["documents"].get(key, [])
+        with metrics.stage("prompt_assembly", dimension=key, documents=len(paths)) as fields:
+            parts = [entry["narratives"].get(key, "")] + self.document_texts(paths)
+            ai_input = "\n\n".join(part for part in parts if part)
+            fields["chars"] = len(ai_input)
+        if not ai_input:
+            row["error"] = NO_INPUT
+            return row
+        if self.structured:
+            final_prompt, final_input = prepare_reduce(prompt, ai_input, partial(self.scorer.get_ai_score, role=key),
+                                                       token_budget=dimension_token_budget(key), structured=True)
+            try:
+                if is_ai_error(final_input):
+                    raise StructuredOutputError(final_input)
+                result = self.scorer.get_structured_score(title, final_prompt, final_input)
+            except StructuredOutputError as e:
+                row["error"] = str(e)
+                return row
+            output = format_structured_score(result)
+            # Subcomponent scores as JSON, for aggregation below the dimension level
+            row["subcomponents"] = json.dumps(result["subcomponents"], ensure_ascii=False)
+        else:
+            output = map_reduce_score(prompt, ai_input, partial(self.scorer.get_ai_score, role=key),
+                                      token_budget=dimension_token_budget(key))
+        row["ai_output"] = output
+        if is_ai_error(output):
+            row["error"] = output
+            return row
+        row["score"] = extract_avg_score(output, title)
+        if row["score"] is None:
+            row["error"] = "could not extract scores"
+            return row
+        return self.add_recommendations(row, title)
+
+    def add_recommendations(self, row, title):
+        if row["score"] < 4:
+            recommendations = self.scorer.get_ai_score(recommendation_prompt(title, row["score"]), "", role="recommendations")
+            if is_ai_error(recommendations):
+                row["error"] = recommendations
+            else:
+                row["recommendations"] = recommendations
+        return row
+
+    # One structured request for every dimension of a country with a narrative or documents (its
+    # own or shared ones); returns one row per dimension, the others marked as having no input
+    def assess_country(self, entry):
+        rows = {title: _empty_row(entry["country"], title) for title, _, _ in DIMENSIONS}
+        shared = entry["documents"].get(SHARED_DOCUMENTS, [])
+        assessed = {title: key for title, key, _ in DIMENSIONS
+                    if entry["narratives"].get(key, "").strip() or shared or entry["documents"].get(key)}
+        for title in rows.keys() - assessed.keys():
+            rows[title]["error"] = NO_INPUT
+        if not assessed:
+            return list(rows.values())
+        narratives = {title: entry["narratives"].get(key, "") for title, key in assessed.items()}
+        # Each document is read and sent once, however many dimensions it is attached to
+        paths = _document_paths(entry)
+        with metrics.stage("prompt_assembly", dimension="combined", documents=len(paths)) as fields:
+            ai_input = assess_all_input(narratives, self.document_texts(paths))
+            fields["chars"] = len(ai_input)
+        try:
+            final_prompt, final_input = prepare_reduce(assess_all_prompt(list(assessed)), ai_input,
+                                                       partial(self.scorer.get_ai_score, role="combined"),
+                                                       token_budget=dimension_token_budget(*assessed.values()), structured=True)
+            if is_ai_error(final_input):
+                raise StructuredOutputError(final_input)
+            results = self.scorer.assess_all(final_prompt, final_input, list(assessed))
+        except StructuredOutputError as e:
+            for title in assessed:
+                rows[title]["error"] = str(e)
+            return list(rows.values())
+        for title, result in results.items():
+            row = rows[title]
+            row["score"] = result["average"]
+            row["subcomponents"] = json.dumps(result["subcomponents"], ensure_ascii=False)
+            row["ai_output"] = format_structured_score(result)
+            row["recommendations"] = format_recommendations(result["recommendations"])
+        return list(rows.values())
+
+    def run(self, countries, checkpoint, workers=4, progress=None):
+        if self.assess_all:
+            tasks = [
+                (self.assess_country, (entry,), entry, [title for title, _, _ in DIMENSIONS])
+                for entry in countries
+                if not all(checkpoint.done(entry["country"], title) for title, _, _ in DIMENSIONS)
+            ]
+        else:
+            tasks = [
+                (lambda *task: [self.assess_dimension(*task)],
+                 (entry, title, key, prompt, checkpoint.pending_recommendations(entry["country"], title)), entry, [title])
+                for entry in countries
+                for title, key, prompt in DIMENSIONS
+                if not checkpoint.done(entry["country"], title)
+            ]
+        # Document texts are kept until the last task of every country using them has finished
+        pending = Counter(id(entry) for _, _, entry, _ in tasks)
+        users = Counter(path for entry in {id(entry): entry for _, _, entry, _ in tasks}.values() for path in _document_paths(entry))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(fn, *args): (entry, titles) for fn, args, entry, titles in tasks}
+            for future in as_completed(futures):
+                entry, titles = futures[future]
+                pending[id(entry)] -= 1
+                if not pending[id(entry)]:
+                    users.subtract(_document_paths(entry))
+                    self.release_texts([path for path in _document_paths(entry) if users[path] <= 0])
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    rows = [dict(_empty_row(entry["country"], title), error=str(e)) for title in titles]
+                for row in rows:
+                    # Failed rows are reported but not checkpointed, so a rerun retries them; dimensions
+                    # with nothing to assess are final, and a scored row whose recommendations failed is
+                    # kept so that only the recommendations are retried
+                    if checkpoint.keeps(row):
+                        checkpoint.record(row)
+                    else:
+                        checkpoint.results[(row["country"], row["dimension"])] = row
+                    if progress:
+                        progress(row)
+        order = {entry["country"]: i for i, entry in enumerate(countries)}
+        dimension_order = {title: i for i, (title, _, _) in enumerate(DIMENSIONS)}
+        rows = [row for row in checkpoint.results.values() if row["country"] in order]
+        return sorted(rows, key=lambda row: (order[row["country"]], dimension_order.get(row["dimension"], 0)))
+
+
+def _indicator_value(text):
+    text = (text or "").strip().lower()
+    if text in ("yes", "y", "true", "x"):
+        return 1.0
+    if text in ("", "no", "n", "false"):
+        return 0.0
+    return float(text)
+
+
+# Manual scores for every row of an indicator CSV: one row per country with each dimension's
+# score and the combined score
+def score_indicator_file(path, rubric=RUBRIC):
+    engine = rubric.engine
+    with open(path, newline="", encoding="utf-8") as f:
+        records = list(csv.DictReader(f))
+    unknown = [column for column in (records[0] if records else {}) if column != "country" and column not in engine.indicator_ids]
+    if unknown:
+        raise ValueError(f"unknown indicator columns: {', '.join(unknown)}")
+    matrix = engine.indicator_matrix([
+        {column: _indicator_value(value) for column, value in record.items() if column != "country"} for record in records
+    ])
+    scores = engine.score_indicators(matrix)
+    combined = engine.combine(scores)
+    return [
+        {"country": record.get("country", ""), **{title: round(float(score), 2) for title, score in zip(engine.titles, row)},
+         "combined": round(float(total), 2)}
+        for record, row, total in zip(records, scores, combined)
+    ]
+
+
+def write_results(rows, path, columns=RESULT_COLUMNS):
+    if path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(rows, columns=columns).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score CFED dimensions for many countries without the UI.")
+    parser.add_argument("input", help="Manifest JSON file or directory with one folder per country (or a CSV with --indicators)")
+    parser.add_argument("--output", default="cfed_batch_scores.csv", help="Results file (.csv or .parquet)")
+    parser.add_argument("--checkpoint", default=None, help="JSONL checkpoint file (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent dimension assessments")
+    parser.add_argument("--rpm", type=int, default=60, help="Maximum AI requests per minute (0 for no limit)")
+    parser.add_argument("--tpm", type=int, default=0, help="Maximum AI tokens per minute (0 for no limit)")
+    parser.add_argument("--model", default=default_model(), help="Default model; CFED_AI_MODEL_<ROLE> overrides it per dimension")
+    parser.add_argument("--backend", choices=BACKENDS, default=LLM_BACKEND, help="LLM backend (default: CFED_LLM_BACKEND or openai)")
+    parser.add_argument("--base-url", default=LLM_BASE_URL, help="Endpoint of an OpenAI-compatible server for --backend local")
+    parser.add_argument("--structured", action="store_true", help="Score through the validated JSON schema")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT,
+                        help="Serve Prometheus metrics on this port while the run is in progress")
+    parser.add_argument("--assess-all", action="store_true",
+                        help="Score every dimension with input, and its recommendations, in one request per country")
+    parser.add_argument("--indicators", action="store_true",
+                        help="Input is a CSV of manual indicator assessments, scored with the rubric instead of AI")
+    args = parser.parse_args(argv)
+
+    if args.indicators:
+        rows = score_indicator_file(args.input)
+        write_results(rows, args.output, ["country"] + RUBRIC.engine.titles + ["combined"])
+        print(f"Wrote {len(rows)} rows to {args.output}", file=sys.stderr)
+        return
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key and needs_api_key(args.backend):
+        parser.error("OPENAI_API_KEY environment variable not set.")
+    cache = ResponseCache(
+        max_entries=int(os.getenv("CFED_AI_CACHE_SIZE", "256")),
+        db_path=os.getenv("CFED_AI_CACHE_DB") or None
+    )
+    if args.backend == "mock":
+        factory = backend_factory("mock")
+    else:
+        factory = backend_factory(args.backend, api_key, base_url=args.base_url, pool_size=max(args.workers, HTTP_POOL_SIZE))
+    ai_client = AIClient(factory, RateLimiter(args.rpm, args.tpm))
+    scorer = Scorer(ai_client, cache, args.model, model_routes_from_env())
+    runner = BatchRunner(scorer, structured=args.structured, assess_all=args.assess_all)
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+    countries = load_manifest(args.input)
+    checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint.jsonl")
+
+    def progress(row):
+        status = row["error"] or f"score {row['score']}"
+        print(f"{row['country']} – {row['dimension']}: {status}", file=sys.stderr)
+
+    rows = runner.run(countries, checkpoint, workers=args.workers, progress=progress)
+    write_results(rows, args.output)
+    print(f"Wrote {len(rows)} rows to {args.output}", file=sys.stderr)
+    evidence_tokens = {labels["state"]: value for labels, value in metrics.REGISTRY.counter_values("cfed_evidence_tokens_total")}
+    if evidence_tokens.get("extracted"):
+        print(f"Documents: {evidence_tokens['extracted']:,} tokens extracted, {evidence_tokens['compressed']:,} sent "
+              f"({1 - evidence_tokens['compressed'] / evidence_tokens['extracted']:.0%} removed)", file=sys.stderr)
+    role_rows, _ = metrics.summary()
+    for row in role_rows:
+        print(f"{row['role']}: {row['calls']} AI calls ({row['cache hits']} cached), "
+              f"{row['prompt tokens'] + row['completion tokens']:,} tokens, ~${row['cost (USD)']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai_client import AIClient  # noqa: E402
+from cfed_scoring import DIMENSIONS, Scorer, extract_avg_score, recommendation_prompt  # noqa: E402
+from chunking import prepare_reduce  # noqa: E402
+from evidence_compression import compress_evidence  # noqa: E402
+from llm_backends import MockLLM  # noqa: E402
+from parse_cache import ParseCache  # noqa: E402
+from report_renderer import render_recommendations_pdf  # noqa: E402
+from text_extraction import LocalFile, extract_text_from_file  # noqa: E402
+
+# Load and latency benchmark for the scoring pipeline.
+#
+# Simulated users run the path a dimension tab and the Summary tab take for one upload:
+#   extract  – extract_text_from_file on a synthetic PDF or DOCX
+#   compress – evidence_compression.compress_evidence on the extracted text
+#   score    – prompt assembly, map-reduce over long evidence and the scoring call
+#   parse    – extract_avg_score on the reply
+#   report   – the recommendation call and render_recommendations_pdf
+# The LLM is llm_backends.MockLLM with the given latency, so the numbers show the app's own
+# overhead plus whatever model latency is assumed. The response cache is not used and every
+# request carries a unique narrative, so no request is answered from another one. The parse
+# cache is off unless --parse-cache is given, so extract measures parsing by default.
+#
+#     python benchmarks/bench_pipeline.py --users 8 --requests 40 --pages 1 10 50 --latency-ms 800
+#
+# Reports p50/p95 end-to-end latency, throughput, the process memory high-water mark and
+# per-stage p50/p95 for each document size. --json writes the same figures for comparing runs.
+
+STAGES = ["extract", "compress", "score", "parse", "report"]
+WORDS = (
+    "climate finance strategy policy enforcement stakeholder consultation infrastructure data digital "
+    "platform regulatory public private development bank multilateral proposal pipeline access "
+    "engagement adaptation mitigation resilience ministry budget investment grant loan monitoring"
+).split()
+WORDS_PER_PARAGRAPH = 60
+PARAGRAPHS_PER_PAGE = 8
+
+
+def _paragraphs(pages, seed):
+    rng = random.Random(seed)
+    for _ in range(pages * PARAGRAPHS_PER_PAGE):
+        yield " ".join(rng.choice(WORDS) for _ in range(WORDS_PER_PARAGRAPH)).capitalize() + "."
+
+
+def make_pdf(path, pages, seed=0):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=False)
+    pdf.set_font("Arial", size=9)
+    paragraphs = list(_paragraphs(pages, seed))
+    for page in range(pages):
+        pdf.add_page()
+        for paragraph in paragraphs[page * PARAGRAPHS_PER_PAGE:(page + 1) * PARAGRAPHS_PER_PAGE]:
+            pdf.multi_cell(0, 4, paragraph)
+    pdf.output(path)
+
+
+def make_docx(path, pages, seed=0):
+    import docx
+    document = docx.Document()
+    for paragraph in _paragraphs(pages, seed):
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Pipeline:
+    def __init__(self, latency, token_latency, parse_cache=None):
+        self.backend = MockLLM(latency=latency, token_latency=token_latency)
+        self.parse_cache = parse_cache
+        self.scorer = Scorer(AIClient(self.backend))
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _next_id(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    # One simulated user request; returns {stage: seconds}
+    def run(self, path):
+        request_id = self._next_id()
+        title, key, prompt = DIMENSIONS[request_id % len(DIMENSIONS)]
+        timings = {}
+
+        start = time.perf_counter()
+        text = extract_text_from_file(LocalFile(path), cache=self.parse_cache)
+        timings["extract"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text, _ = compress_evidence(text)
+        timings["compress"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ai_input = f"Narrative for request {request_id}.\n\n{text}"
+        score_fn = partial(self.scorer.get_ai_score, role=key)
+        final_prompt, final_input = prepare_reduce(prompt, ai_input, score_fn)
+        output = score_fn(final_prompt, final_input)
+        timings["score"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        score = extract_avg_score(output, title)
+        timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recommendations = self.scorer.get_ai_score(recommendation_prompt(title, score), f"Request {request_id}", role="recommendations")
+        render_recommendations_pdf((f"### {title} (request {request_id})\n{recommendations}",))
+        timings["report"] = time.perf_counter() - start
+        return timings
+
+
+def run_size(pipeline, path, users, requests):
+    samples = []
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        for timings in pool.map(lambda _: pipeline.run(path), range(requests)):
+            samples.append(timings)
+    wall = time.perf_counter() - start
+    totals = [sum(t.values()) for t in samples]
+    result = {
+        "requests": requests,
+        "p50_ms": percentile(totals, 50) * 1000,
+        "p95_ms": percentile(totals, 95) * 1000,
+        "throughput_rps": requests / wall,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {
+            stage: {
+                "p50_ms": percentile([t[stage] for t in samples], 50) * 1000,
+                "p95_ms": percentile([t[stage] for t in samples], 95) * 1000,
+                "share": statistics.fmean(t[stage] for t in samples) / max(statistics.fmean(totals), 1e-9)
+            }
+            for stage in STAGES
+        }
+    }
+    if tracemalloc.is_tracing():
+        result["python_heap_peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the CFED scoring pipeline with a mock LLM.")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per document size")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50], help="Synthetic document sizes in pages")
+    parser.add_argument("--format", choices=["pdf", "docx"], default="pdf")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Mock LLM latency per request")
+    parser.add_argument("--token-latency-ms", type=float, default=0, help="Mock LLM latency per generated word")
+    parser.add_argument("--parse-cache", action="store_true",
+                        help="Read extracted text through a fresh parse cache, so repeat uploads skip parsing")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report the Python heap peak (slower)")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    make = make_pdf if args.format == "pdf" else make_docx
+    results = {}
+    print(f"{'pages':>5} {'p50 (ms)':>9} {'p95 (ms)':>9} {'req/s':>7} {'peak RSS (MB)':>14}  "
+          + "  ".join(f"{stage + ' p50/p95':>20}" for stage in STAGES))
+    with tempfile.TemporaryDirectory() as tmp:
+        parse_cache = ParseCache(os.path.join(tmp, "parse_cache")) if args.parse_cache else None
+        pipeline = Pipeline(args.latency_ms / 1000, args.token_latency_ms / 1000, parse_cache)
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic-{pages}.{args.format}")
+            make(path, pages, seed=pages)
+            # One untimed request warms imports, the PDF worker pool and the logo cache
+            pipeline.run(path)
+            result = run_size(pipeline, path, args.users, args.requests)
+            results[pages] = result
+            stages = "  ".join(
+                f"{result['stages'][s]['p50_ms']:>9.1f}/{result['stages'][s]['p95_ms']:<10.1f}" for s in STAGES
+            )
+            print(f"{pages:>5} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['throughput_rps']:>7.2f} "
+                  f"{result['peak_rss_mb']:>14.1f}  {stages}")
+            if "python_heap_peak_mb" in result:
+                print(f"{'':>5} Python heap peak {result['python_heap_peak_mb']:.1f} MB")
+    print(f"\n{pipeline.backend.calls} mock LLM calls, {args.users} users, {args.format.upper()} documents")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
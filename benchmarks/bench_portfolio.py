@@ -0,0 +1,58 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assessment_store import AssessmentStore, empty_state  # noqa: E402
+from portfolio import TITLES, distributions, load_portfolio, score_portfolio  # noqa: E402
+
+# Portfolio aggregation benchmark.
+# Fills a temporary assessment database with synthetic country-year assessments and times
+# loading them (one query and a pivot) and scoring them (combined scores, tiers, bands,
+# ranks, deltas and distributions).
+#
+#     python benchmarks/bench_portfolio.py --countries 100 --versions 5
+
+
+def fill(store, countries, versions, seed=0):
+    rng = random.Random(seed)
+    for c in range(countries):
+        for _ in range(versions):
+            assessment_id, _ = store.create_assessment(f"Country {c:03d}")
+            state = empty_state()
+            state["scores"] = {title: rng.choice([0, 1, 1.5, 2, 2.25, 3, 4]) for title in TITLES}
+            store.save(assessment_id, state)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time portfolio aggregation over many stored assessments.")
+    parser.add_argument("--countries", type=int, default=100)
+    parser.add_argument("--versions", type=int, default=5, help="Assessments per country")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AssessmentStore(os.path.join(tmp, "portfolio.sqlite3"))
+        fill(store, args.countries, args.versions)
+        load_times, score_times = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            frame = load_portfolio(store)
+            load_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            scored = score_portfolio(frame)
+            distributions(scored[scored["latest"]])
+            score_times.append(time.perf_counter() - start)
+    print(f"{len(scored)} assessments, {args.countries} countries")
+    print(f"load  median {statistics.median(load_times) * 1000:.1f} ms")
+    print(f"score median {statistics.median(score_times) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Startup benchmark for the Streamlit apps.
+#
+# Each repetition runs in a fresh interpreter with Streamlit already imported (as it is in a
+# running server) and measures:
+#   first paint – the first script run of a new session, including every import the script
+#                 triggers and the first rendered elements
+#   rerun       – a second run of the same session, which is what every widget interaction pays
+#
+#     python benchmarks/bench_startup.py --repeat 5
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["CFED_AI_Tool_App_FIXED.py", "CFED_AI_Tool_App.py"]
+
+PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+start = time.perf_counter()
+at.run()
+first_paint = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+heavy = [m for m in ("openai", "pandas", "numpy", "PyPDF2", "docx", "fpdf") if m in sys.modules]
+print(json.dumps({"first_paint": first_paint, "rerun": rerun, "loaded": heavy, "errors": len(at.exception)}))
+"""
+
+
+def measure(app):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, os.path.join(ROOT, app)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time to first paint of the CFED Streamlit apps.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("apps", nargs="*", default=APPS)
+    args = parser.parse_args(argv)
+
+    print(f"{'app':<28} {'first paint (ms)':>17} {'rerun (ms)':>11}  modules loaded by first paint")
+    for app in args.apps:
+        samples = [measure(app) for _ in range(args.repeat)]
+        first_paint = statistics.median(s["first_paint"] for s in samples) * 1000
+        rerun = statistics.median(s["rerun"] for s in samples) * 1000
+        loaded = ", ".join(samples[-1]["loaded"]) or "-"
+        errors = " (script raised an exception)" if any(s["errors"] for s in samples) else ""
+        print(f"{app:<28} {first_paint:>17.0f} {rerun:>11.0f}  {loaded}{errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import json
+import re
+import time
+from functools import partial
+
+import metrics
+from ai_cache import cache_key
+from rubric import get_rubric
+
+# Scoring logic shared by the Streamlit app and the batch runner.
+# Nothing in this module depends on Streamlit.
+
+AI_MODEL = "gpt-3.5-turbo"
+AI_ERROR_PREFIX = "AI error:"
+
+RUBRIC = get_rubric()
+
+# (title, key, AI prompt) for each dimension, in display order
+DIMENSIONS = [(d.title, d.key, d.prompt) for d in RUBRIC.dimensions]
+DIMENSION_PROMPTS = {title: prompt for title, _, prompt in DIMENSIONS}
+DIMENSION_KEYS = {title: key for title, key, _ in DIMENSIONS}
+
+# Subcomponents named in each dimension prompt, numbered from 1 in this order
+SUBCOMPONENTS = {d.title: [s.name for s in d.subcomponents] for d in RUBRIC.dimensions}
+MIN_SUBCOMPONENT_SCORE = RUBRIC.min_score
+MAX_SUBCOMPONENT_SCORE = RUBRIC.max_score
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+# (lowest score, label, colour) from the top down: maturity bands for a dimension score and
+# tiers for the combined score. portfolio.py applies the same thresholds to whole columns.
+MATURITY_BANDS = [
+    (3, "Mature", "#81c784", "Robust, inclusive, and sustainable systems in place."),
+    (2, "Emerging", "#fdd835", "Some key structures exist, but inconsistent or weak."),
+    (float("-inf"), "Nascent", "#e57373", "Early-stage systems with significant gaps.")
+]
+COMBINED_TIERS = [
+    (2.5, "High", "#81c784"),
+    (1.5, "Medium", "#fdd835"),
+    (float("-inf"), "Low", "#e57373")
+]
+
+
+def maturity_band(score):
+    return next(band for band in MATURITY_BANDS if score >= band[0])
+
+
+def combined_tier(score):
+    return next(tier for tier in COMBINED_TIERS if score >= tier[0])
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def recommendation_prompt(dimension, score):
+    return f"Provide 3–5 recommendations for improving {dimension} with a current score of {score}."
+
+
+def is_ai_error(output):
+    return AI_ERROR_PREFIX in output
+
+
+# System prompt for structured scoring: the dimension prompt plus a fixed JSON schema
+def structured_prompt(title, prompt):
+    subcomponents = ", ".join(f'{{"id": {i}, "name": "{name}"}}' for i, name in enumerate(SUBCOMPONENTS[title], 1))
+    return (
+        f"{prompt}\n\nRespond only with a JSON object of the form "
+        '{"subcomponents": [{"id": <number>, "name": <string>, "score": <integer>, "rationale": <string>}], "summary": <string>}. '
+        f"Include exactly these subcomponents: {subcomponents}. "
+        f"Each score is an integer from {MIN_SUBCOMPONENT_SCORE} to {MAX_SUBCOMPONENT_SCORE}; "
+        "each rationale is one or two sentences citing the evidence."
+    )
+
+
+# Parse and check a structured reply; raises StructuredOutputError describing the first problem
+def _parse_json(raw):
+    try:
+        data = json.loads(raw)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise StructuredOutputError(f"reply is not valid JSON ({e})")
+    if not isinstance(data, dict):
+        raise StructuredOutputError("reply must be a JSON object")
+    return data
+
+
+def _check_dimension(title, data):
+    if not isinstance(data.get("subcomponents"), list):
+        raise StructuredOutputError(f'{title} must have a "subcomponents" list')
+    names = SUBCOMPONENTS[title]
+    by_id = {}
+    for item in data["subcomponents"]:
+        if not isinstance(item, dict):
+            raise StructuredOutputError("each subcomponent must be an object")
+        try:
+            sub_id = int(item.get("id"))
+            score = int(item.get("score"))
+        except (TypeError, ValueError):
+            raise StructuredOutputError(f"subcomponent {item.get('id')!r} needs an integer id and score")
+        if sub_id not in range(1, len(names) + 1):
+            raise StructuredOutputError(f"unknown subcomponent id {sub_id}")
+        if sub_id in by_id:
+            raise StructuredOutputError(f"subcomponent {sub_id} appears more than once")
+        if not MIN_SUBCOMPONENT_SCORE <= score <= MAX_SUBCOMPONENT_SCORE:
+            raise StructuredOutputError(f"score for subcomponent {sub_id} must be {MIN_SUBCOMPONENT_SCORE}–{MAX_SUBCOMPONENT_SCORE}")
+        by_id[sub_id] = {"id": sub_id, "name": names[sub_id - 1], "score": score, "rationale": str(item.get("rationale", "")).strip()}
+    missing = [str(i) for i in range(1, len(names) + 1) if i not in by_id]
+    if missing:
+        raise StructuredOutputError(f"missing subcomponents {', '.join(missing)}")
+    subcomponents = [by_id[i] for i in sorted(by_id)]
+    return {
+        "subcomponents": subcomponents,
+        "average": round(RUBRIC.engine.score_dimension_subcomponents(title, [s["score"] for s in subcomponents]), 2),
+        "summary": str(data.get("summary", "")).strip()
+    }
+
+
+def validate_structured_score(title, raw):
+    return _check_dimension(title, _parse_json(raw))
+
+
+# System prompt for scoring several dimensions in one request (all of them unless titles is given),
+# on the same subcomponents as the dimension prompts
+def assess_all_prompt(titles=None):
+    titles = list(SUBCOMPONENTS) if titles is None else titles
+    sections = []
+    for title in titles:
+        subcomponents = ", ".join(f"({i}) {name}" for i, name in enumerate(SUBCOMPONENTS[title], 1))
+        sections.append(f"{title}: {subcomponents}")
+    return (
+        "You are a climate finance expert. Assess a country's climate finance ecosystem on the dimensions "
+        "below using the evidence provided.\n\n" + "\n".join(sections) + "\n\n"
+        "Respond only with a JSON object of the form "
+        '{"dimensions": [{"dimension": <string>, "subcomponents": [{"id": <number>, "score": <integer>, "rationale": <string>}], '
+        '"summary": <string>, "recommendations": [<string>]}]}. '
+        "Include every dimension listed above, and no other, by its exact name with all of its subcomponents. "
+        f"Each score is an integer from {MIN_SUBCOMPONENT_SCORE} to {MAX_SUBCOMPONENT_SCORE}; "
+        "each rationale is one or two sentences citing the evidence. "
+        "Give 3–5 recommendations per dimension for improving it from its current score."
+    )
+
+
+# User message for assess_all_prompt: each dimension's narrative, then the documents once.
+# narratives maps dimension title to text; documents is a list of document texts, deduplicated
+# by the caller so evidence attached to several dimensions is only sent once.
+def assess_all_input(narratives, documents=()):
+    sections = [f"## {title}\n{text.strip()}" for title, text in narratives.items() if text and text.strip()]
+    if documents:
+        sections.append("## Supporting documents\n" + "\n\n".join(documents))
+    return "\n\n".join(sections)
+
+
+# Check a combined reply: {title: result} with validate_structured_score's fields plus "recommendations",
+# for the titles requested (all dimensions by default); other dimensions in the reply are ignored
+def validate_assessment(raw, titles=None):
+    titles = list(SUBCOMPONENTS) if titles is None else titles
+    data = _parse_json(raw)
+    if not isinstance(data.get("dimensions"), list):
+        raise StructuredOutputError('reply must be an object with a "dimensions" list')
+    by_title = {}
+    for item in data["dimensions"]:
+        if not isinstance(item, dict) or item.get("dimension") not in SUBCOMPONENTS:
+            raise StructuredOutputError(f"unknown dimension {item.get('dimension') if isinstance(item, dict) else item!r}")
+        by_title[item["dimension"]] = item
+    missing = [title for title in titles if title not in by_title]
+    if missing:
+        raise StructuredOutputError(f"missing dimensions {', '.join(missing)}")
+    results = {}
+    for title in titles:
+        result = _check_dimension(title, by_title[title])
+        recommendations = by_title[title].get("recommendations")
+        if not isinstance(recommendations, list) or not recommendations:
+            raise StructuredOutputError(f'{title} must have a non-empty "recommendations" list')
+        result["recommendations"] = [str(r).strip() for r in recommendations if str(r).strip()]
+        results[title] = result
+    return results
+
+
+# Markdown in the '(n) Subcomponent: score' format, so extract_avg_score reads it too
+def format_structured_score(result):
+    lines = [f"({s['id']}) {s['name']}: {s['score']} – {s['rationale']}" for s in result["subcomponents"]]
+    if result["summary"]:
+        lines.append(result["summary"])
+    return "\n\n".join(lines)
+
+
+def format_recommendations(recommendations):
+    return "\n".join(f"- {r}" for r in recommendations)
+
+
+# More reliable score extraction.
+# With a dimension title, a reply scoring each of its subcomponents once is averaged with the rubric weights.
+def extract_avg_score(output, title=None):
+    score_lines = re.findall(r"\((\d)\)\s*[^:\n]+:\s*(\d)", output)
+    if title in SUBCOMPONENTS:
+        by_id = {int(i): int(s) for i, s in score_lines}
+        if sorted(by_id) == list(range(1, len(SUBCOMPONENTS[title]) + 1)) and len(score_lines) == len(by_id):
+            return round(RUBRIC.engine.score_dimension_subcomponents(title, [by_id[i] for i in sorted(by_id)]), 2)
+    scores = [int(s) for _, s in score_lines]
+    if scores:
+        return round(sum(scores) / len(scores), 2)
+    return None
+
+
+# Scoring calls through an ai_client.AIClient, with an optional ResponseCache in front of it.
+# models maps a role – a dimension key, "recommendations" or "combined" – to the model used
+# for it; roles not listed use `model`.
+class Scorer:
+    def __init__(self, client, cache=None, model=AI_MODEL, models=None):
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.models = dict(models or {})
+
+    def model_for(self, role=None):
+        return self.models.get(role, self.model)
+
+    def _messages(self, prompt, user_input):
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_input}
+        ]
+
+    def _cached(self, key):
+        return self.cache.get(key) if self.cache is not None else None
+
+    def _remember(self, key, output):
+        if self.cache is not None:
+            self.cache.set(key, output)
+
+    # AI scoring function
+    def get_ai_score(self, prompt, user_input, role=None):
+        model = self.model_for(role)
+        key = cache_key(model, prompt, user_input)
+        with metrics.ai_call(role, model) as call:
+            cached = self._cached(key)
+            if cached is not None:
+                call.cached = True
+                return cached
+            try:
+                output = self.client.complete(model, self._messages(prompt, user_input)).strip()
+            except Exception as e:
+                # Retries are exhausted at this point; errors are not cached so a later attempt calls again
+                call.status = "error"
+                return f"{AI_ERROR_PREFIX} {str(e)}"
+        self._remember(key, output)
+        return output
+
+    # Structured scoring: JSON mode with a fixed schema, validated, with one repair attempt.
+    # Returns the validated result dict or raises StructuredOutputError.
+    def get_structured_score(self, title, prompt, user_input):
+        return self._validated_completion(structured_prompt(title, prompt), user_input,
+                                          lambda raw: validate_structured_score(title, raw), DIMENSION_KEYS.get(title))
+
+    # All four dimensions and their recommendations in one structured request.
+    # prompt is assess_all_prompt() (or its reduced form from chunking.prepare_reduce) and
+    # user_input is assess_all_input(...). Returns validate_assessment's dict or raises StructuredOutputError.
+    def assess_all(self, prompt, user_input, titles=None):
+        return self._validated_completion(prompt, user_input, partial(validate_assessment, titles=titles), "combined")
+
+    def _validated_completion(self, system, user_input, validate, role=None):
+        model = self.model_for(role)
+        key = cache_key(model, system, user_input)
+        with metrics.ai_call(role, model) as call:
+            cached = self._cached(key)
+            if cached is not None:
+                call.cached = True
+                return validate(cached)
+            messages = self._messages(system, user_input)
+            try:
+                raw = self.client.complete(model, messages, response_format=JSON_RESPONSE_FORMAT)
+                try:
+                    result = validate(raw)
+                except StructuredOutputError as e:
+                    call.retries += 1
+                    messages = messages + [
+                        {"role": "assistant", "content": raw},
+                        {"role": "user", "content": f"That reply was invalid: {e}. Reply again with only the corrected JSON object."}
+                    ]
+                    raw = self.client.complete(model, messages, response_format=JSON_RESPONSE_FORMAT)
+                    result = validate(raw)
+            except StructuredOutputError:
+                raise
+            except Exception as e:
+                raise StructuredOutputError(f"{AI_ERROR_PREFIX} {str(e)}")
+        self._remember(key, raw)
+        return result
+
+    # Streaming variant of get_ai_score: yields text chunks as they arrive.
+    # The full completion is cached once the stream finishes.
+    def stream_ai_score(self, prompt, user_input, role=None):
+        model = self.model_for(role)
+        key = cache_key(model, prompt, user_input)
+        # Recorded by hand: a context variable must not stay set across the generator's yields
+        call = metrics.AICall(role, model)
+        start = time.perf_counter()
+        cached = self._cached(key)
+        if cached is not None:
+            call.cached = True
+            metrics.record_ai_call(call, time.perf_counter() - start)
+            yield cached
+            return
+        parts = []
+        try:
+            with metrics.track(call):
+                stream = self.client.stream(model, self._messages(prompt, user_input))
+            for chunk in stream:
+                call.add_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            call.status = "error"
+            yield f"\n\n{AI_ERROR_PREFIX} {str(e)}"
+            return
+        finally:
+            metrics.record_ai_call(call, time.perf_counter() - start)
+        self._remember(key, "".join(parts).strip())
@@ -0,0 +1,130 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from cfed_scoring import RUBRIC, is_ai_error
+
+# Token-aware chunking and map-reduce scoring for inputs too long for one request.
+# Inputs that fit in a single chunk are scored exactly as before.
+
+CHUNK_TOKENS = int(os.getenv("CFED_CHUNK_TOKENS", "3000"))
+# Upper bound on evidence tokens sent in the map stage for one dimension, unless the rubric
+# gives the dimension its own token_budget
+TOKEN_BUDGET = int(os.getenv("CFED_TOKEN_BUDGET", "24000"))
+MAP_WORKERS = int(os.getenv("CFED_MAP_WORKERS", "4"))
+CHARS_PER_TOKEN = 4
+
+MAP_INSTRUCTIONS = (
+    "\n\nYou are reviewing part {part} of {total} of the evidence. Summarize the evidence in this part "
+    "that is relevant to each numbered subcomponent above and give a provisional score 0–3 for each, "
+    "one per line in the format '(n) Subcomponent: score'. Say 'no evidence' where a part is silent."
+)
+# Structured prompts ask for JSON only; the map stage still answers in plain text
+STRUCTURED_MAP_INSTRUCTIONS = MAP_INSTRUCTIONS + " For this part only, reply in plain text rather than JSON."
+REDUCE_INSTRUCTIONS = (
+    "\n\nThe evidence was too long to review at once and has been assessed in parts. Combine the partial "
+    "assessments below into one final assessment. Report each subcomponent on its own line in the format "
+    "'(n) Subcomponent: score' with a score 0–3, followed by a short rationale."
+)
+STRUCTURED_REDUCE_INSTRUCTIONS = (
+    "\n\nThe evidence was too long to review at once and has been assessed in parts. Combine the partial "
+    "assessments below into one final assessment, replying in the JSON format described above."
+)
+
+
+# Map-stage token budget of one or more dimensions (by key), from the rubric
+def dimension_token_budget(*keys):
+    return sum(RUBRIC.by_key[key].token_budget or TOKEN_BUDGET for key in keys)
+
+
+# tiktoken is optional; without it token counts are estimated from character length
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# Hard-split a single oversized block into pieces of at most max_tokens
+def _split_block(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding is None:
+        step = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + step] for i in range(0, len(text), step)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+# Split text into chunks of at most max_tokens, breaking on paragraph boundaries where possible
+def split_by_tokens(text, max_tokens=CHUNK_TOKENS):
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            continue
+        paragraph_tokens = count_tokens(paragraph)
+        if paragraph_tokens > max_tokens:
+            pieces = _split_block(paragraph, max_tokens)
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            piece_tokens = paragraph_tokens if len(pieces) == 1 else count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+# Keep at most max_chunks, spread evenly so the whole document stays represented
+def _sample_chunks(chunks, max_chunks):
+    if len(chunks) <= max_chunks:
+        return chunks
+    if max_chunks == 1:
+        return chunks[:1]
+    step = (len(chunks) - 1) / (max_chunks - 1)
+    return [chunks[round(i * step)] for i in range(max_chunks)]
+
+
+# Map stage: score chunks concurrently with score_fn(prompt, text) and return the
+# (system prompt, user input) pair for the final reduce call. Short inputs pass through.
+# structured=True when the reduce reply is validated as JSON, so it is not asked for score lines.
+def prepare_reduce(prompt, text, score_fn, chunk_tokens=CHUNK_TOKENS, token_budget=TOKEN_BUDGET, workers=MAP_WORKERS,
+                   structured=False):
+    if count_tokens(text) <= chunk_tokens:
+        return prompt, text
+    chunks = split_by_tokens(text, chunk_tokens)
+    chunks = _sample_chunks(chunks, max(1, token_budget // chunk_tokens))
+    total = len(chunks)
+    map_instructions = STRUCTURED_MAP_INSTRUCTIONS if structured else MAP_INSTRUCTIONS
+    map_prompts = [prompt + map_instructions.format(part=i + 1, total=total) for i in range(total)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, total))) as pool:
+        partials = list(pool.map(score_fn, map_prompts, chunks))
+    usable = [(i, output) for i, output in enumerate(partials) if not is_ai_error(output)]
+    if not usable:
+        return prompt, partials[0]
+    combined = "\n\n".join(f"Part {i + 1} of {total}:\n{output}" for i, output in usable)
+    return prompt + (STRUCTURED_REDUCE_INSTRUCTIONS if structured else REDUCE_INSTRUCTIONS), combined
+
+
+# Full map-reduce: returns text in the '(n) Subcomponent: score' format extract_avg_score expects
+def map_reduce_score(prompt, text, score_fn, **kwargs):
+    reduce_prompt, reduce_input = prepare_reduce(prompt, text, score_fn, **kwargs)
+    if is_ai_error(reduce_input):
+        return reduce_input
+    return score_fn(reduce_prompt, reduce_input)
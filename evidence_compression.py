@@ -0,0 +1,217 @@
+import os
+import re
+import zlib
+from collections import Counter
+
+from chunking import count_tokens
+from metrics import REGISTRY, stage
+
+# Evidence compression between text extraction and the scoring prompt.
+# Extracted PDF/DOCX text carries a lot that costs tokens without adding evidence:
+#   - runs of spaces and blank lines, and words hyphenated across line breaks
+#   - page furniture: running headers and footers repeated as the first or last line of pages, and
+#     page numbers there (text_extraction separates PDF pages with a form feed; text without page
+#     breaks, such as DOCX, has no furniture beyond a page number)
+#   - table-of-contents lines with dot leaders
+#   - paragraphs repeated verbatim or nearly so (boilerplate, executive summaries restating the body)
+# compress_evidence removes these and reports the token counts before and after. Near-duplicate
+# paragraphs are found with MinHash over word shingles, banded so only likely pairs are compared.
+#
+#   CFED_COMPRESS_EVIDENCE  – 0 to send extracted text unchanged
+#   CFED_DEDUP_THRESHOLD    – estimated Jaccard similarity above which a paragraph is a near duplicate
+
+COMPRESS_EVIDENCE = os.getenv("CFED_COMPRESS_EVIDENCE", "1") != "0"
+DEDUP_THRESHOLD = float(os.getenv("CFED_DEDUP_THRESHOLD", "0.8"))
+
+# First or last lines of a page of at most this many words that recur on this many pages are
+# treated as headers or footers
+FURNITURE_MAX_WORDS = 12
+FURNITURE_MIN_REPEATS = 3
+# Paragraphs shorter than this are never dropped as duplicates
+DEDUP_MIN_WORDS = 8
+SHINGLE_WORDS = 3
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+
+TABLE_CELL_SEPARATOR = " | "
+PAGE_BREAK = "\f"
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+_PAGE_NUMBER = re.compile(r"^[-–—\s]*(page\s+)?(\d{1,4}|[ivx]{1,5})(\s*(of|/)\s*\d{1,4})?[-–—\s]*$", re.IGNORECASE)
+_DOT_LEADER = re.compile(r"(\.\s?){4,}\s*\S{0,6}\s*$|…{2,}\s*\S{0,6}\s*$")
+_PARAGRAPH_END = re.compile(r"[.!?:;]['\")\]]?$")
+_WORD = re.compile(r"\w+")
+
+
+def _normalize_line(line):
+    return _SPACES.sub(" ", line).strip()
+
+
+# Key under which a header or footer recurs; digits are kept, so different figures never match
+def _furniture_key(line):
+    return line.lower()
+
+
+# Lines where at least half the words contain digits, such as table rows ("2021 450") or
+# figures, are evidence however often they recur
+def _mostly_numeric(line):
+    words = line.split()
+    return 2 * sum(any(c.isdigit() for c in word) for word in words) >= len(words)
+
+
+# Short lines that are not table rows, figures or sentences; repeated short sentences are kept
+def _is_furniture_candidate(line):
+    return (TABLE_CELL_SEPARATOR not in line and len(line.split()) <= FURNITURE_MAX_WORDS
+            and not _PARAGRAPH_END.search(line) and not _mostly_numeric(line))
+
+
+# A page number: only on the first or last line of a page, and no higher than the page count
+# (printed numbers run behind the page index when there is front matter), so a year or a
+# figure that happens to open a page is kept
+def _is_page_number(line, page_count):
+    match = _PAGE_NUMBER.match(line)
+    return bool(match) and (not match.group(2).isdigit() or int(match.group(2)) <= page_count)
+
+
+# Normalized lines of every page, and the indices of each page's first and last non-blank line
+def _page_lines(text):
+    lines = []
+    boundaries = set()
+    for page in text.split(PAGE_BREAK):
+        page_lines = [_normalize_line(line) for line in page.splitlines()]
+        filled = [i for i, line in enumerate(page_lines) if line]
+        if filled:
+            boundaries.update((len(lines) + filled[0], len(lines) + filled[-1]))
+        lines.extend(page_lines)
+    return lines, boundaries
+
+
+# Paragraphs, as lists of lines, from cleaned lines: a paragraph ends at a blank line or a
+# line ending a sentence, and table rows stand alone. Line breaks are kept so headings stay
+# on their own lines.
+def _paragraphs(lines):
+    paragraphs = []
+    current = []
+    for line in lines:
+        if not line or TABLE_CELL_SEPARATOR in line:
+            if current:
+                paragraphs.append(current)
+                current = []
+            if line:
+                paragraphs.append([line])
+            continue
+        if current and current[-1].endswith("-") and line[:1].islower():
+            # Word hyphenated across a line break
+            current[-1] = current[-1][:-1] + line
+        else:
+            current.append(line)
+        if _PARAGRAPH_END.search(line):
+            paragraphs.append(current)
+            current = []
+    if current:
+        paragraphs.append(current)
+    return paragraphs
+
+
+# Indices of paragraphs (lists of lines) that repeat, exactly or nearly, an earlier paragraph
+def near_duplicates(paragraphs, threshold=DEDUP_THRESHOLD):
+    candidates = []
+    word_hashes = []
+    seen_exact = set()
+    duplicates = set()
+    for i, paragraph in enumerate(paragraphs):
+        words = _WORD.findall(" ".join(paragraph).lower())
+        if len(words) < DEDUP_MIN_WORDS:
+            continue
+        exact = " ".join(words)
+        if exact in seen_exact:
+            duplicates.add(i)
+            continue
+        seen_exact.add(exact)
+        candidates.append(i)
+        # crc32 rather than hash() so results do not depend on PYTHONHASHSEED
+        word_hashes.append([zlib.crc32(word.encode("utf-8")) for word in words])
+    if len(candidates) < 2:
+        return duplicates
+
+    import numpy as np
+    rng = np.random.default_rng(0)
+    # Every paragraph's words in one array; a shingle's hash mixes the hashes of its words
+    lengths = np.array([len(hashes) for hashes in word_hashes])
+    flat = np.fromiter((h for hashes in word_hashes for h in hashes), dtype=np.uint64, count=int(lengths.sum()))
+    span = len(flat) - SHINGLE_WORDS + 1
+    mix = rng.integers(1, 1 << 63, SHINGLE_WORDS, dtype=np.uint64) | np.uint64(1)
+    shingles = np.zeros(span, dtype=np.uint64)
+    for k in range(SHINGLE_WORDS):
+        shingles += flat[k:k + span] * mix[k]
+    # Keep shingles that start and end inside one paragraph
+    ends = np.cumsum(lengths)
+    owner = np.repeat(np.arange(len(lengths)), lengths)[:span]
+    shingles = shingles[np.arange(span) + SHINGLE_WORDS <= ends[owner]]
+    starts = np.concatenate(([0], np.cumsum(lengths - SHINGLE_WORDS + 1)[:-1]))
+    # MinHash with multiply-shift hashing: the high 32 bits of a * x + b (mod 2^64)
+    a = rng.integers(1, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+    # Computed in place, one row per permutation, to avoid large temporaries
+    hashed = a[:, None] * shingles[None, :]
+    hashed += b[:, None]
+    hashed >>= np.uint64(32)
+    signatures = np.minimum.reduceat(hashed, starts, axis=1).T
+
+    # Banding: only paragraphs sharing every value in some band are compared
+    rows_per_band = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    buckets = {}
+    for row, index in enumerate(candidates):
+        bands = [signatures[row, band * rows_per_band:(band + 1) * rows_per_band].tobytes() for band in range(MINHASH_BANDS)]
+        matches = {other for band, key in enumerate(bands) for other in buckets.get((band, key), ())}
+        if any((signatures[row] == signatures[other]).mean() >= threshold for other in matches):
+            duplicates.add(index)
+            continue
+        for band, key in enumerate(bands):
+            buckets.setdefault((band, key), []).append(row)
+    return duplicates
+
+
+class CompressionStats:
+    def __init__(self, tokens_before, tokens_after, furniture_lines, duplicate_paragraphs):
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.furniture_lines = furniture_lines
+        self.duplicate_paragraphs = duplicate_paragraphs
+
+    @property
+    def saved_share(self):
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+
+# Compressed text of one extracted document, and what was removed
+def compress_evidence(text, enabled=COMPRESS_EVIDENCE):
+    tokens_before = count_tokens(text)
+    if not enabled or not text:
+        text = text.replace(PAGE_BREAK, "\n")
+        return text, CompressionStats(tokens_before, tokens_before, 0, 0)
+    with stage("compress_evidence", chars=len(text)) as fields:
+        lines, boundaries = _page_lines(text)
+        page_count = text.count(PAGE_BREAK) + 1
+        # Only counted across page breaks, so short lines recurring in the body (labels such as
+        # "Status: Approved" in each entry of a list) are never mistaken for headers
+        repeats = Counter()
+        if PAGE_BREAK in text:
+            repeats.update(_furniture_key(lines[i]) for i in boundaries if _is_furniture_candidate(lines[i]))
+        cleaned = []
+        furniture = 0
+        for i, line in enumerate(lines):
+            if line and (_DOT_LEADER.search(line) or (i in boundaries and (
+                    _is_page_number(line, page_count)
+                    or (_is_furniture_candidate(line) and repeats[_furniture_key(line)] >= FURNITURE_MIN_REPEATS)))):
+                furniture += 1
+                continue
+            cleaned.append(line)
+        paragraphs = _paragraphs(cleaned)
+        duplicates = near_duplicates(paragraphs)
+        compressed = "\n".join(line for i, paragraph in enumerate(paragraphs) if i not in duplicates for line in paragraph)
+        stats = CompressionStats(tokens_before, count_tokens(compressed), furniture, len(duplicates))
+        fields.update(tokens_before=stats.tokens_before, tokens_after=stats.tokens_after,
+                      furniture_lines=furniture, duplicate_paragraphs=len(duplicates))
+    REGISTRY.inc("cfed_evidence_tokens_total", stats.tokens_before, state="extracted")
+    REGISTRY.inc("cfed_evidence_tokens_total", stats.tokens_after, state="compressed")
+    return compressed, stats
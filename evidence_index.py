@@ -0,0 +1,156 @@
+import json
+import os
+import tempfile
+import threading
+
+from chunking import count_tokens, split_by_tokens
+from rubric import get_rubric
+
+# Local vector index over uploaded evidence.
+# Each document is split into passages, embedded once and stored on disk as a float32
+# matrix keyed by its content hash, the embedding backend and model; later loads memory-map
+# the matrix instead of re-embedding. A stored matrix whose width differs from the vectors
+# the embedding function returns now is embedded again.
+
+INDEX_DIR = os.getenv("CFED_INDEX_DIR", ".cfed_index")
+PASSAGE_TOKENS = int(os.getenv("CFED_PASSAGE_TOKENS", "400"))
+TOP_K = int(os.getenv("CFED_RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_TOKENS = int(os.getenv("CFED_RETRIEVAL_TOKENS", "3000"))
+# Documents shorter than this are sent whole; retrieval only pays off for large evidence packs
+RETRIEVAL_MIN_TOKENS = int(os.getenv("CFED_RETRIEVAL_MIN_TOKENS", "3000"))
+EMBED_BATCH = 96
+
+# One query per subcomponent named in each dimension's AI prompt, from the rubric
+SUBCOMPONENT_QUERIES = {d.key: [s.query for s in d.subcomponents] for d in get_rubric().dimensions}
+
+
+def _normalize(matrix):
+    import numpy as np
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EvidenceIndex:
+    # embed_fn takes a list of strings and returns one embedding vector per string; backend
+    # names the service behind it, since backends can return different vectors for one model name
+    def __init__(self, embed_fn, model_name, index_dir=INDEX_DIR, backend="openai"):
+        self.embed_fn = embed_fn
+        self.model_name = model_name
+        self.index_dir = index_dir
+        self.backend = backend
+        self._segments = {}
+        self._query_vectors = {}
+        # Width of the vectors embed_fn returns, once known
+        self._width = None
+        self._lock = threading.Lock()
+
+    def _paths(self, digest):
+        stem = os.path.join(self.index_dir, f"{digest}-{self.backend}-{self.model_name.replace('/', '_')}")
+        return stem + ".npy", stem + ".json"
+
+    def _embed(self, texts):
+        import numpy as np
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            vectors.extend(self.embed_fn(texts[start:start + EMBED_BATCH]))
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        self._width = matrix.shape[1]
+        return matrix
+
+    def _write(self, digest, passages):
+        import numpy as np
+        matrix_path, passages_path = self._paths(digest)
+        matrix = self._embed(passages) if passages else np.zeros((0, 1), dtype=np.float32)
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Each write goes to its own temporary files, renamed into place, so concurrent writers of
+        # one document never share a file and readers never see half of one
+        matrix_fd, matrix_tmp = tempfile.mkstemp(dir=self.index_dir, suffix=".npy.tmp")
+        passages_fd, passages_tmp = tempfile.mkstemp(dir=self.index_dir, suffix=".json.tmp")
+        try:
+            with os.fdopen(matrix_fd, "wb") as f:
+                np.save(f, matrix)
+            with os.fdopen(passages_fd, "w", encoding="utf-8") as f:
+                json.dump(passages, f)
+            os.replace(matrix_tmp, matrix_path)
+            os.replace(passages_tmp, passages_path)
+        finally:
+            for path in (matrix_tmp, passages_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _load(self, digest):
+        import numpy as np
+        matrix_path, passages_path = self._paths(digest)
+        with open(passages_path, encoding="utf-8") as f:
+            passages = json.load(f)
+        matrix = np.load(matrix_path, mmap_mode="r")
+        return matrix, passages
+
+    # Index a document once per content hash; reuses the on-disk matrix when present and as wide
+    # as the vectors embed_fn returns
+    def add_document(self, digest, text):
+        with self._lock:
+            if digest in self._segments:
+                return
+        matrix_path, passages_path = self._paths(digest)
+        if not (os.path.exists(matrix_path) and os.path.exists(passages_path)):
+            self._write(digest, split_by_tokens(text, PASSAGE_TOKENS))
+        matrix, passages = self._load(digest)
+        if passages and self._width is not None and matrix.shape[1] != self._width:
+            self._write(digest, passages)
+            matrix, passages = self._load(digest)
+        with self._lock:
+            self._segments[digest] = (matrix, passages)
+
+    def _query_matrix(self, queries):
+        import numpy as np
+        missing = [q for q in queries if q not in self._query_vectors]
+        if missing:
+            for query, vector in zip(missing, self._embed(missing)):
+                self._query_vectors[query] = vector
+        return np.stack([self._query_vectors[q] for q in queries])
+
+    # Return the passages most similar to the queries, taking each query's hits in turn
+    # so every subcomponent is represented, and emitting them in document order
+    def retrieve(self, digests, queries, top_k=TOP_K, token_budget=RETRIEVAL_TOKENS):
+        import numpy as np
+        segments = [(digest, self._segments[digest]) for digest in digests if digest in self._segments]
+        segments = [(digest, matrix, passages) for digest, (matrix, passages) in segments if len(passages)]
+        if not segments:
+            return []
+        query_matrix = self._query_matrix(queries)
+        # Matrices indexed before the width was known are checked against the query vectors
+        for pos, (digest, matrix, passages) in enumerate(segments):
+            if matrix.shape[1] != query_matrix.shape[1]:
+                self._write(digest, passages)
+                matrix, passages = self._load(digest)
+                with self._lock:
+                    self._segments[digest] = (matrix, passages)
+                segments[pos] = (digest, matrix, passages)
+        ranked = [[] for _ in queries]
+        for doc_pos, (digest, matrix, passages) in enumerate(segments):
+            similarities = np.asarray(matrix @ query_matrix.T)
+            k = min(top_k, len(passages))
+            for qi in range(len(queries)):
+                column = similarities[:, qi]
+                top = np.argpartition(-column, k - 1)[:k]
+                ranked[qi].extend((float(column[i]), doc_pos, int(i)) for i in top)
+        for hits in ranked:
+            hits.sort(reverse=True)
+
+        chosen = set()
+        used_tokens = 0
+        for rank in range(top_k):
+            for hits in ranked:
+                if rank >= len(hits):
+                    continue
+                _, doc_pos, idx = hits[rank]
+                if (doc_pos, idx) in chosen:
+                    continue
+                passage_tokens = count_tokens(segments[doc_pos][2][idx])
+                if used_tokens + passage_tokens > token_budget:
+                    continue
+                chosen.add((doc_pos, idx))
+                used_tokens += passage_tokens
+        return [segments[doc_pos][2][idx] for doc_pos, idx in sorted(chosen)]
@@ -0,0 +1,101 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Process-wide background executor for AI jobs.
+# A job is identified by a hash of its inputs, so identical requests from any session or
+# rerun share one run. Each session points named slots (e.g. "score:env") at jobs; the script
+# only reads job state, so reruns and widget interactions never cancel work in flight.
+# Job functions run on worker threads and must not call Streamlit.
+
+JOB_WORKERS = int(os.getenv("CFED_JOB_WORKERS", "8"))
+# Slots whose job finished longer ago than this are forgotten, along with the job
+JOB_TTL_SECONDS = int(os.getenv("CFED_JOB_TTL_SECONDS", "3600"))
+
+_job_ids = itertools.count(1)
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        # Distinguishes a rerun of the same key after forget()
+        self.id = next(_job_ids)
+        self.future = None
+        # Partial output a job may publish while it runs, e.g. streamed text
+        self.progress = ""
+        self.submitted = time.time()
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    # The job's return value; re-raises the exception if the job failed
+    def result(self):
+        return self.future.result()
+
+    def exception(self):
+        return self.future.exception() if self.done else None
+
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cfed-job")
+        self._jobs = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    # Point the session's slot at the job for `key`, starting fn(job, *args) if no such job
+    # exists yet. Calling this again with the same key (e.g. on every rerun) is a no-op.
+    def submit(self, session_id, slot, key, fn, *args, **kwargs):
+        with self._lock:
+            self._prune()
+            self._slots[(session_id, slot)] = key
+            job = self._jobs.get(key)
+            if job is None:
+                job = Job(key)
+                self._jobs[key] = job
+                job.future = self._pool.submit(fn, job, *args, **kwargs)
+                job.future.add_done_callback(lambda _: setattr(job, "finished", time.time()))
+            return job
+
+    def get(self, session_id, slot):
+        with self._lock:
+            key = self._slots.get((session_id, slot))
+            return self._jobs.get(key) if key is not None else None
+
+    def session_jobs(self, session_id):
+        with self._lock:
+            return {
+                slot: self._jobs[key] for (sid, slot), key in self._slots.items()
+                if sid == session_id and key in self._jobs
+            }
+
+    def release(self, session_id, slot):
+        with self._lock:
+            self._slots.pop((session_id, slot), None)
+
+    # Drop a finished job so the next submit with its key runs it again
+    def forget(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.done:
+                del self._jobs[key]
+
+    def running(self, session_id):
+        return [slot for slot, job in self.session_jobs(session_id).items() if not job.done]
+
+    # Caller must hold self._lock
+    def _prune(self):
+        now = time.time()
+        for slot, key in list(self._slots.items()):
+            job = self._jobs.get(key)
+            if job is None or (job.finished is not None and now - job.finished > self.ttl):
+                del self._slots[slot]
+        referenced = set(self._slots.values())
+        for key, job in list(self._jobs.items()):
+            if key not in referenced and job.done:
+                del self._jobs[key]
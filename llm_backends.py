@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+
+from cfed_scoring import AI_MODEL, DIMENSIONS, MAX_SUBCOMPONENT_SCORE, MIN_SUBCOMPONENT_SCORE, SUBCOMPONENTS
+
+# LLM backends and model routing.
+# A backend is any object shaped like the OpenAI client (chat.completions.create and
+# embeddings.create); ai_client.AIClient adds rate limiting, retries and coalescing on top.
+#
+#   openai – the OpenAI API (OPENAI_API_KEY)
+#   local  – any OpenAI-compatible server, e.g. vLLM, Ollama or llama.cpp (CFED_LLM_BASE_URL)
+#   mock   – deterministic offline replies with configurable latency, for load tests and
+#            environments without outbound access
+#
+# Models are chosen per role: a dimension key (env, infra, providers, seekers),
+# "recommendations" or "combined". CFED_AI_MODEL sets the default and CFED_AI_MODEL_<ROLE>
+# overrides it, e.g. CFED_AI_MODEL_SEEKERS=gpt-4o-mini.
+
+BACKENDS = ("openai", "local", "mock")
+LLM_BACKEND = os.getenv("CFED_LLM_BACKEND", "openai")
+LLM_BASE_URL = os.getenv("CFED_LLM_BASE_URL", "http://localhost:8000/v1")
+MODEL_ROLES = [key for _, key, _ in DIMENSIONS] + ["recommendations", "combined"]
+
+# Mock latency: a fixed delay per request plus a delay per streamed or generated word
+MOCK_LATENCY_SECONDS = float(os.getenv("CFED_MOCK_LATENCY_MS", "0")) / 1000
+MOCK_TOKEN_LATENCY_SECONDS = float(os.getenv("CFED_MOCK_TOKEN_LATENCY_MS", "0")) / 1000
+MOCK_EMBEDDING_SIZE = 64
+
+
+# {role: model} from CFED_AI_MODEL_<ROLE>; roles without an override use the default model
+def model_routes_from_env(environ=os.environ):
+    return {role: environ[f"CFED_AI_MODEL_{role.upper()}"] for role in MODEL_ROLES if environ.get(f"CFED_AI_MODEL_{role.upper()}")}
+
+
+def default_model(environ=os.environ):
+    return environ.get("CFED_AI_MODEL") or AI_MODEL
+
+
+# Whether the chosen backend can run without OPENAI_API_KEY
+def needs_api_key(backend=LLM_BACKEND):
+    return backend == "openai"
+
+
+# Zero-argument factory for the backend, so AIClient builds it (and imports the SDK) on first use
+def backend_factory(backend=LLM_BACKEND, api_key=None, base_url=LLM_BASE_URL, **kwargs):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {backend!r}; choose one of {', '.join(BACKENDS)}")
+    if backend == "mock":
+        return lambda: MockLLM(**kwargs)
+    from ai_client import create_openai_client
+    if backend == "local":
+        # Local servers usually ignore the key, but the SDK insists on one
+        key = api_key or os.getenv("CFED_LLM_API_KEY") or "local"
+        return lambda: create_openai_client(key, base_url=base_url, **kwargs)
+    return lambda: create_openai_client(api_key, **kwargs)
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).digest()
+
+
+class _Completions:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, model, messages, stream=False, response_format=None, stream_options=None, **kwargs):
+        include_usage = bool(stream_options and stream_options.get("include_usage"))
+        return self._backend.chat_completion(model, messages, stream, response_format, include_usage)
+
+
+class _Embeddings:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, model, input, **kwargs):
+        return self._backend.embedding(model, input)
+
+
+# Offline stand-in for the OpenAI client. Replies depend only on the model and messages,
+# so repeated runs give identical scores, and they follow the formats the app parses:
+# "(n) Subcomponent: score" lines for free text and the schemas in cfed_scoring for JSON mode.
+class MockLLM:
+    def __init__(self, latency=MOCK_LATENCY_SECONDS, token_latency=MOCK_TOKEN_LATENCY_SECONDS):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.embeddings = _Embeddings(self)
+
+    def _score(self, seed, title, sub_id):
+        span = MAX_SUBCOMPONENT_SCORE - MIN_SUBCOMPONENT_SCORE + 1
+        return MIN_SUBCOMPONENT_SCORE + _digest(seed, title, sub_id)[0] % span
+
+    def _dimension(self, seed, title):
+        return {
+            "dimension": title,
+            "subcomponents": [
+                {"id": i, "name": name, "score": self._score(seed, title, i), "rationale": f"Mock assessment of {name.lower()}."}
+                for i, name in enumerate(SUBCOMPONENTS[title], 1)
+            ],
+            "summary": f"Mock summary for {title}.",
+            "recommendations": [f"Mock recommendation {i} for {title}." for i in range(1, 4)]
+        }
+
+    def reply(self, model, messages, response_format=None):
+        system = messages[0]["content"] if messages else ""
+        seed = [model, messages[-1]["content"] if messages else ""]
+        # The dimension is recognised by which subcomponent names its prompt mentions
+        title = max(SUBCOMPONENTS, key=lambda t: sum(name.lower() in system.lower() for name in SUBCOMPONENTS[t]))
+        if response_format and response_format.get("type") == "json_object":
+            if '"dimensions"' in system:
+                # Only the dimensions the prompt lists, as "<title>: (1) <subcomponent>, ..."
+                requested = [title for title in SUBCOMPONENTS if f"{title}: (1) " in system]
+                return json.dumps({"dimensions": [self._dimension(seed, title) for title in requested]})
+            return json.dumps(self._dimension(seed, title))
+        if "recommendations for improving" in system:
+            return "\n".join(f"{i}. Mock recommendation {i}." for i in range(1, 4))
+        lines = [f"({i}) {name}: {self._score(seed, title, i)} – mock rationale." for i, name in enumerate(SUBCOMPONENTS[title], 1)]
+        return "\n\n".join(lines)
+
+    def _usage(self, messages, text):
+        prompt_tokens = sum(len(_words(m["content"])) for m in messages)
+        completion_tokens = len(_words(text))
+        return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                               total_tokens=prompt_tokens + completion_tokens)
+
+    def chat_completion(self, model, messages, stream=False, response_format=None, include_usage=False):
+        self.calls += 1
+        time.sleep(self.latency)
+        text = self.reply(model, messages, response_format)
+        if stream:
+            return self._stream(text, self._usage(messages, text) if include_usage else None)
+        time.sleep(self.token_latency * len(_words(text)))
+        message = SimpleNamespace(role="assistant", content=text)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                               usage=self._usage(messages, text))
+
+    def _stream(self, text, usage=None):
+        for piece in re.findall(r"\S+\s*|\s+", text):
+            time.sleep(self.token_latency)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+        if usage is not None:
+            yield SimpleNamespace(choices=[], usage=usage)
+
+    # Hashed bag-of-words vectors: texts sharing words get similar vectors, so retrieval
+    # still favours relevant passages offline
+    def embedding(self, model, inputs):
+        time.sleep(self.latency)
+        vectors = []
+        tokens = 0
+        for text in inputs:
+            vector = [0.0] * MOCK_EMBEDDING_SIZE
+            words = _words(text)
+            tokens += len(words)
+            for word in words:
+                vector[_digest(word)[0] % MOCK_EMBEDDING_SIZE] += 1.0
+            vectors.append(SimpleNamespace(embedding=vector))
+        return SimpleNamespace(data=vectors, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
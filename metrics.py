@@ -0,0 +1,266 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Timing, token and cost instrumentation.
+# Stages (document parsing, prompt assembly, PDF rendering) and AI calls are recorded in a
+# process-wide registry that renders in the Prometheus text format, and each one is also
+# written as a JSON log line on the "cfed.metrics" logger.
+#
+#   CFED_METRICS_LOG   – "stderr" or a file path to send the JSON log lines there
+#   CFED_METRICS_PORT  – serve /metrics on this port (see start_metrics_server)
+#   CFED_MODEL_PRICES  – JSON {"model": [USD per 1K prompt tokens, USD per 1K completion tokens]}
+#                        added to or overriding MODEL_PRICES
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01)
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("CFED_MODEL_PRICES", "{}")).items()})
+METRICS_PORT = int(os.getenv("CFED_METRICS_PORT", "0"))
+
+HELP = {
+    "cfed_stage_seconds": "Duration of pipeline stages",
+    "cfed_parsed_bytes_total": "Bytes of uploaded documents parsed",
+    "cfed_parse_cache_total": "Parsed-text cache lookups by result",
+    "cfed_evidence_tokens_total": "Document tokens before and after evidence compression",
+    "cfed_ai_request_seconds": "Duration of AI calls, including cache lookups and retries",
+    "cfed_ai_requests_total": "AI calls by role, model, cache result and status",
+    "cfed_ai_tokens_total": "Prompt and completion tokens sent to and received from the model",
+    "cfed_ai_retries_total": "Retried AI requests",
+    "cfed_ai_cost_usd_total": "Estimated AI spend in US dollars"
+}
+
+logger = logging.getLogger("cfed.metrics")
+_log_target = os.getenv("CFED_METRICS_LOG")
+if _log_target:
+    _handler = logging.StreamHandler() if _log_target == "stderr" else logging.FileHandler(_log_target)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            counts, total, count = self._histograms.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self._histograms[key] = (counts, total + value, count + 1)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # Prometheus text exposition format
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._histograms.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    # [(labels, value)] for one counter and [(labels, sum, count)] for one histogram
+    def counter_values(self, name):
+        with self._lock:
+            return [(dict(labels), value) for (n, labels), value in self._counters.items() if n == name]
+
+    def histogram_values(self, name):
+        with self._lock:
+            return [(dict(labels), total, count) for (n, labels), (_, total, count) in self._histograms.items() if n == name]
+
+
+REGISTRY = Registry()
+
+
+# Time a pipeline stage. The yielded dict can be filled in with fields for the log line.
+@contextmanager
+def stage(name, **fields):
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe("cfed_stage_seconds", seconds, stage=name)
+        log_event("stage", stage=name, seconds=round(seconds, 4), **fields)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class AICall:
+    def __init__(self, role, model):
+        self.role = role or "default"
+        self.model = model
+        self.cached = False
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.status = "ok"
+
+    def add_usage(self, usage):
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+_current_call = contextvars.ContextVar("cfed_ai_call", default=None)
+
+
+# The AI call being made on this thread, so the client can attach token usage and retries
+def current_ai_call():
+    return _current_call.get()
+
+
+# Make `call` the current AI call without recording it; for calls that span a generator
+@contextmanager
+def track(call):
+    token = _current_call.set(call)
+    try:
+        yield call
+    finally:
+        _current_call.reset(token)
+
+
+@contextmanager
+def ai_call(role, model):
+    call = AICall(role, model)
+    start = time.perf_counter()
+    try:
+        with track(call):
+            yield call
+    except Exception:
+        call.status = "error"
+        raise
+    finally:
+        record_ai_call(call, time.perf_counter() - start)
+
+
+def record_ai_call(call, seconds):
+    cache = "hit" if call.cached else "miss"
+    cost = estimate_cost(call.model, call.prompt_tokens, call.completion_tokens)
+    REGISTRY.observe("cfed_ai_request_seconds", seconds, role=call.role, model=call.model, cache=cache)
+    REGISTRY.inc("cfed_ai_requests_total", role=call.role, model=call.model, cache=cache, status=call.status)
+    if call.prompt_tokens or call.completion_tokens:
+        REGISTRY.inc("cfed_ai_tokens_total", call.prompt_tokens, role=call.role, model=call.model, kind="prompt")
+        REGISTRY.inc("cfed_ai_tokens_total", call.completion_tokens, role=call.role, model=call.model, kind="completion")
+        REGISTRY.inc("cfed_ai_cost_usd_total", cost, role=call.role, model=call.model)
+    if call.retries:
+        REGISTRY.inc("cfed_ai_retries_total", call.retries, role=call.role, model=call.model)
+    log_event("ai_call", role=call.role, model=call.model, seconds=round(seconds, 4), cache=cache,
+              status=call.status, retries=call.retries, prompt_tokens=call.prompt_tokens,
+              completion_tokens=call.completion_tokens, cost_usd=round(cost, 6))
+
+
+# Serve REGISTRY at http://<host>:<port>/metrics from a daemon thread
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0", registry=REGISTRY):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="cfed-metrics", daemon=True).start()
+    return server
+
+
+# Per-role and per-stage totals for the admin panel
+def summary(registry=REGISTRY):
+    roles = {}
+    for labels, total, count in registry.histogram_values("cfed_ai_request_seconds"):
+        row = roles.setdefault(labels["role"], {"role": labels["role"], "calls": 0, "cache hits": 0, "seconds": 0.0,
+                                                "prompt tokens": 0, "completion tokens": 0, "cost (USD)": 0.0, "retries": 0})
+        row["calls"] += count
+        row["seconds"] += total
+        if labels["cache"] == "hit":
+            row["cache hits"] += count
+    for labels, value in registry.counter_values("cfed_ai_tokens_total"):
+        if labels["role"] in roles:
+            roles[labels["role"]][f"{labels['kind']} tokens"] += value
+    for labels, value in registry.counter_values("cfed_ai_cost_usd_total"):
+        if labels["role"] in roles:
+            roles[labels["role"]]["cost (USD)"] += value
+    for labels, value in registry.counter_values("cfed_ai_retries_total"):
+        if labels["role"] in roles:
+            roles[labels["role"]]["retries"] += value
+    for row in roles.values():
+        row["mean latency (s)"] = round(row.pop("seconds") / row["calls"], 3) if row["calls"] else 0.0
+        row["cost (USD)"] = round(row["cost (USD)"], 6)
+    stages = [
+        {"stage": labels["stage"], "count": count, "mean (s)": round(total / count, 3) if count else 0.0, "total (s)": round(total, 2)}
+        for labels, total, count in registry.histogram_values("cfed_stage_seconds")
+    ]
+    return sorted(roles.values(), key=lambda r: r["role"]), sorted(stages, key=lambda s: s["stage"])
@@ -0,0 +1,74 @@
+import streamlit as st
+import os
+import time
+from assessment_store import AssessmentStore
+from portfolio import (TIER_LABELS, TITLES, band_column, combined_trend, delta_column, distributions, load_portfolio,
+                       score_portfolio, score_statistics)
+from static_assets import logo_bytes, style_block
+
+# Multi-country view of every assessment saved by the scoring tool
+
+st.set_page_config(page_title="CFED Portfolio Dashboard", layout="wide")
+st.sidebar.image(logo_bytes(), use_container_width=True)
+st.sidebar.markdown(style_block("sidebar_theme"), unsafe_allow_html=True)
+
+@st.cache_resource
+def get_assessment_store():
+    return AssessmentStore(os.getenv("CFED_ASSESSMENT_DB", "cfed_assessments.sqlite3"))
+
+st.title("Portfolio Dashboard")
+
+start = time.perf_counter()
+scored = score_portfolio(load_portfolio(get_assessment_store()))
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+if scored.empty:
+    st.info("No saved assessments yet. Save an assessment from the scoring tool to see it here.")
+    st.stop()
+
+countries = sorted(scored["country"].unique())
+chosen = st.sidebar.multiselect("Countries", countries, default=countries)
+latest_only = st.sidebar.toggle("Latest version per country only", value=True)
+view = scored[scored["country"].isin(chosen)]
+latest = view[view["latest"]]
+shown = latest if latest_only else view
+st.sidebar.caption(f"{len(scored)} assessments aggregated in {elapsed_ms:.1f} ms")
+
+tier_counts, band_counts = distributions(latest)
+columns = st.columns(2 + len(TIER_LABELS))
+columns[0].metric("Countries", latest["country"].nunique())
+columns[1].metric("Mean combined score", f"{latest['combined'].mean():.2f}" if len(latest) else "–")
+for column, tier in zip(columns[2:], TIER_LABELS):
+    column.metric(f"{tier} maturity", int(tier_counts[tier]))
+
+st.markdown("### Ranking")
+ranking_columns = ["rank", "country", "version", "combined", "tier", "delta"] + TITLES
+st.dataframe(
+    shown.sort_values(["rank", "country", "version"], na_position="last")[ranking_columns],
+    hide_index=True,
+    column_config={
+        "combined": st.column_config.ProgressColumn("Combined", min_value=0, max_value=4, format="%.2f"),
+        "delta": st.column_config.NumberColumn("Change", format="%+.2f", help="Change since the country's previous version")
+    }
+)
+st.bar_chart(latest.set_index("country")[TITLES], stack=False)
+
+st.markdown("### Distributions")
+tier_col, band_col = st.columns(2)
+tier_col.markdown("**Countries per combined tier**")
+tier_col.bar_chart(tier_counts)
+band_col.markdown("**Countries per maturity band and dimension**")
+band_col.dataframe(band_counts)
+st.dataframe(score_statistics(latest).round(2))
+
+if view["version"].max() > 1:
+    st.markdown("### Changes between versions")
+    st.line_chart(combined_trend(view))
+    changed = view[view["delta"].notna()]
+    st.dataframe(changed[["country", "version", "combined", "delta"] + [delta_column(title) for title in TITLES]],
+                 hide_index=True)
+
+st.markdown("### Maturity bands")
+st.dataframe(shown[["country", "version"] + [band_column(title) for title in TITLES]], hide_index=True)
+
+st.download_button("Download portfolio CSV", data=shown.to_csv(index=False), file_name="cfed_portfolio.csv", mime="text/csv")
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+
+from metrics import REGISTRY
+
+# Persistent cache of extracted document text, shared by every session and process.
+# Entries are keyed on a hash of the file content, its type, the page limit and the parser
+# version, and stored as one zlib-compressed file each, so a document uploaded again (in any
+# session, or after a restart) is read back instead of parsed. Reads refresh an entry's
+# modification time, and the least recently used entries are removed once the directory
+# grows past its size limit.
+#
+#   CFED_PARSE_CACHE_DIR – cache directory (default .cfed_parse_cache)
+#   CFED_PARSE_CACHE_MB  – size limit in megabytes of compressed text; 0 disables the cache
+
+PARSE_CACHE_DIR = os.getenv("CFED_PARSE_CACHE_DIR", ".cfed_parse_cache")
+PARSE_CACHE_BYTES = int(float(os.getenv("CFED_PARSE_CACHE_MB", "256")) * 1024 * 1024)
+ENTRY_SUFFIX = ".txt.z"
+
+
+def parse_key(data, mime_type, parser_version, max_pages):
+    content = hashlib.sha256(data).hexdigest()
+    return hashlib.sha256(f"{parser_version}\n{mime_type}\n{max_pages}\n{content}".encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, directory=PARSE_CACHE_DIR, max_bytes=PARSE_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Total size of the entries, measured from the directory on first write
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            REGISTRY.inc("cfed_parse_cache_total", result="miss")
+            return None
+        except (OSError, zlib.error, UnicodeDecodeError):
+            # A damaged entry is dropped and the document parsed again
+            self._remove(path)
+            REGISTRY.inc("cfed_parse_cache_total", result="miss")
+            return None
+        REGISTRY.inc("cfed_parse_cache_total", result="hit")
+        return text
+
+    def set(self, key, text):
+        data = zlib.compress(text.encode("utf-8"), 6)
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Written to a temporary file and renamed, so readers in other processes never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            self._remove(tmp_path)
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._scan()[0]:
+                self._remove(path)
+            self._size = 0
+
+    # Caller must hold self._lock. Other processes may have added entries, so sizes are re-read.
+    def _evict(self):
+        entries, size = self._scan()
+        for path, entry_size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if size <= self.max_bytes:
+                break
+            if self._remove(path):
+                size -= entry_size
+        self._size = size
+
+    # ([(path, size, mtime)], total size) of the entries on disk
+    def _scan(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(ENTRY_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return entries, sum(size for _, size, _ in entries)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+# The process-wide cache, or None when CFED_PARSE_CACHE_MB is 0
+PARSE_CACHE = ParseCache() if PARSE_CACHE_BYTES > 0 else None
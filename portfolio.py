@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from cfed_scoring import COMBINED_TIERS, MATURITY_BANDS, RUBRIC
+
+# Portfolio view over many stored assessments.
+# load_portfolio reads every assessment's scores from an AssessmentStore in one query and
+# pivots them into a frame with one row per (country, version) and one column per dimension.
+# score_portfolio then adds combined scores, tiers, maturity bands, ranks and deltas with
+# column-wise operations, so hundreds of assessments aggregate in milliseconds.
+
+TITLES = [d.title for d in RUBRIC.dimensions]
+ID_COLUMNS = ["assessment_id", "country", "version", "created_at", "updated_at"]
+TIER_LABELS = [label for _, label, _ in COMBINED_TIERS]
+BAND_LABELS = [label for _, label, _, _ in MATURITY_BANDS]
+
+
+def band_column(title):
+    return f"{title} band"
+
+
+def delta_column(title):
+    return f"{title} delta"
+
+
+# Frame from AssessmentStore.score_rows: ID_COLUMNS plus one score column per dimension (NaN if not scored)
+def portfolio_frame(rows):
+    frame = pd.DataFrame.from_records(rows, columns=ID_COLUMNS + ["dimension", "score"])
+    assessments = frame[ID_COLUMNS].drop_duplicates("assessment_id").set_index("assessment_id")
+    scores = frame.dropna(subset=["dimension"]).pivot(index="assessment_id", columns="dimension", values="score")
+    # Dimensions no longer in the rubric are left out
+    return assessments.join(scores.reindex(columns=TITLES)).reset_index()
+
+
+def load_portfolio(store, country=None):
+    return portfolio_frame(store.score_rows(country))
+
+
+# Label every value with the first (lowest score, label, ...) threshold it reaches
+def classify(values, thresholds):
+    values = np.asarray(values, dtype=float)
+    return np.select([values >= threshold[0] for threshold in thresholds], [threshold[1] for threshold in thresholds],
+                     default=thresholds[-1][1])
+
+
+# Changes from each row to the next within a country; rows are sorted by country and version
+def _deltas(values, same_country):
+    deltas = np.full(values.shape, np.nan)
+    deltas[1:] = values[1:] - values[:-1]
+    deltas[~same_country] = np.nan
+    return np.round(deltas, 2)
+
+
+# Adds combined, tier, a band and a delta column per dimension, delta (combined change since
+# the country's previous version), latest and rank (by combined among each country's latest
+# assessment). Dimensions not scored count as 0 in the combined score, as in the app.
+# The new columns are computed as arrays and attached in one step.
+def score_portfolio(frame):
+    scored = frame.sort_values(["country", "version"]).reset_index(drop=True)
+    scores = scored[TITLES].to_numpy(dtype=float)
+    combined = np.round(RUBRIC.engine.combine(np.nan_to_num(scores)), 2)
+    countries = scored["country"].to_numpy()
+    same_country = np.zeros(len(scored), dtype=bool)
+    same_country[1:] = countries[1:] == countries[:-1]
+    latest = np.ones(len(scored), dtype=bool)
+    latest[:-1] = countries[1:] != countries[:-1]
+    bands = np.where(np.isnan(scores), None, classify(scores, MATURITY_BANDS))
+    dimension_deltas = _deltas(scores, same_country[:, None].repeat(len(TITLES), axis=1))
+    columns = {"combined": combined, "tier": classify(combined, COMBINED_TIERS)}
+    columns.update({band_column(title): bands[:, i] for i, title in enumerate(TITLES)})
+    columns["delta"] = _deltas(combined, same_country)
+    columns.update({delta_column(title): dimension_deltas[:, i] for i, title in enumerate(TITLES)})
+    columns["latest"] = latest
+    columns["rank"] = pd.Series(np.where(latest, combined, np.nan)).rank(ascending=False, method="min").astype("Int64")
+    return pd.concat([scored, pd.DataFrame(columns)], axis=1)
+
+
+# Assessments per combined tier, and per maturity band for each dimension
+def distributions(scored):
+    tiers = scored["tier"].value_counts().reindex(TIER_LABELS, fill_value=0)
+    bands = pd.DataFrame({
+        title: scored[band_column(title)].value_counts().reindex(BAND_LABELS, fill_value=0) for title in TITLES
+    })
+    return tiers, bands
+
+
+# Count, mean, spread and quartiles of each dimension and the combined score
+def score_statistics(scored):
+    return scored[TITLES + ["combined"]].describe().T
+
+
+# Combined score by version, one column per country, for trend charts
+def combined_trend(scored):
+    return scored.pivot(index="version", columns="country", values="combined")
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from metrics import stage
+from static_assets import LOGO_PATH
+
+# In-memory PDF reports.
+# Rendered reports are memoized on a hash of their content, so reruns with unchanged
+# scores and recommendations reuse the same bytes, and nothing is written to disk.
+
+MAX_CACHED_REPORTS = 32
+
+_reports = OrderedDict()
+_reports_lock = threading.Lock()
+
+
+def _safe_latin1(text):
+    return str(text).encode("latin1", "replace").decode("latin1")
+
+
+def _new_pdf():
+    from fpdf import FPDF
+    return FPDF()
+
+
+# The logo is parsed once per process, with the PDF version its transparency needs. Each PDF
+# gets its own copy of the parsed image, as fpdf drops the image data once it has been written.
+@lru_cache(maxsize=1)
+def _logo_image():
+    pdf = _new_pdf()
+    return pdf._parsepng(LOGO_PATH), pdf.pdf_version
+
+
+def _add_logo(pdf, **kwargs):
+    info, version = _logo_image()
+    if LOGO_PATH not in pdf.images:
+        pdf.images[LOGO_PATH] = dict(info, i=len(pdf.images) + 1)
+        pdf.pdf_version = max(pdf.pdf_version, version)
+    pdf.image(LOGO_PATH, **kwargs)
+
+
+def _to_bytes(pdf):
+    return pdf.output(dest="S").encode("latin1", "replace")
+
+
+def _memoized(kind, content, render):
+    key = hashlib.sha256(json.dumps([kind, content], ensure_ascii=False).encode("utf-8")).hexdigest()
+    with _reports_lock:
+        if key in _reports:
+            _reports.move_to_end(key)
+            return _reports[key]
+    with stage("render_pdf", kind=kind) as fields:
+        data = render()
+        fields["bytes"] = len(data)
+    with _reports_lock:
+        _reports[key] = data
+        while len(_reports) > MAX_CACHED_REPORTS:
+            _reports.popitem(last=False)
+    return data
+
+
+def render_recommendations_pdf(recommendations):
+    def render():
+        pdf = _new_pdf()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        pdf.cell(200, 10, txt="AI-Based Recommendations for Action", ln=True, align="C")
+        pdf.ln(10)
+        for recommendation in recommendations:
+            pdf.multi_cell(0, 10, _safe_latin1(recommendation))
+        return _to_bytes(pdf)
+    return _memoized("recommendations", list(recommendations), render)
+
+
+# scores is a list of (dimension, score) pairs
+def render_scores_pdf(scores, average):
+    def render():
+        pdf = _new_pdf()
+        pdf.add_page()
+        _add_logo(pdf, x=10, y=8, w=50)
+        pdf.set_font("Arial", size=12)
+        pdf.ln(30)
+        pdf.cell(200, 10, txt="CFED Maturity Assessment Summary", ln=True, align="C")
+        pdf.ln(10)
+        for dimension, score in scores:
+            pdf.cell(200, 10, txt=_safe_latin1(f"{dimension}: {score}/4"), ln=True)
+        pdf.ln(10)
+        pdf.cell(200, 10, txt=f"Average Maturity Score: {average}/4", ln=True)
+        pdf.ln(20)
+        pdf.set_font("Arial", style="I", size=11)
+        pdf.multi_cell(0, 10, "Climate Finance Team\nChemonics International\n2025")
+        return _to_bytes(pdf)
+    return _memoized("scores", [list(map(list, scores)), average], render)
@@ -0,0 +1,307 @@
+import functools
+import json
+import os
+
+# Declarative scoring rubric.
+# rubric.json defines each dimension's AI prompt, the subcomponents the prompt scores (with
+# their weights and retrieval queries), the manual-scoring indicators (with their weights), the
+# quick-check questions of the single-page diagnostic, an optional per-dimension token_budget
+# for the chunked map stage and the help texts shown in the apps. It is loaded and validated once per process by get_rubric();
+# cfed_scoring, evidence_index, the app and the batch runner all read dimensions from it.
+#
+#   CFED_RUBRIC – path to an alternative rubric file
+#
+# Rubric.engine compiles the weights into matrices, so any number of indicator or subcomponent
+# vectors is scored with one matrix product.
+
+RUBRIC_PATH = os.getenv("CFED_RUBRIC", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rubric.json"))
+
+
+class RubricError(ValueError):
+    pass
+
+
+def _require(condition, message):
+    if not condition:
+        raise RubricError(message)
+
+
+def _text(item, field, where):
+    value = item.get(field)
+    _require(isinstance(value, str) and value.strip(), f"{where} needs a non-empty {field!r}")
+    return value
+
+
+def _weight(item, where):
+    weight = item.get("weight", 1)
+    _require(isinstance(weight, (int, float)) and not isinstance(weight, bool) and weight > 0,
+             f"{where} weight must be a positive number")
+    return float(weight)
+
+
+class Subcomponent:
+    def __init__(self, name, weight, query):
+        self.name = name
+        self.weight = weight
+        self.query = query
+
+
+class Indicator:
+    def __init__(self, id, label, help, weight, choices=("No", "Yes"), met=("Yes",), requires=None):
+        self.id = id
+        self.label = label
+        self.help = help
+        self.weight = weight
+        # Quick-check questions only: the answers offered, those that meet the indicator, and
+        # the id of an indicator that must also be met
+        self.choices = list(choices)
+        self.met = list(met)
+        self.requires = requires
+
+
+class Dimension:
+    def __init__(self, title, key, weight, prompt, narrative_help, upload_help, subcomponents, indicators, quick_indicators,
+                 token_budget=None):
+        self.title = title
+        self.key = key
+        self.weight = weight
+        self.prompt = prompt
+        self.narrative_help = narrative_help
+        self.upload_help = upload_help
+        self.subcomponents = subcomponents
+        self.indicators = indicators
+        self.quick_indicators = quick_indicators
+        # Evidence tokens scored in the map stage; None uses chunking.TOKEN_BUDGET
+        self.token_budget = token_budget
+
+    # Highest manual score: every indicator met
+    @property
+    def max_indicator_score(self):
+        return sum(indicator.weight for indicator in self.indicators)
+
+    # Which quick-check indicators the answers ({id: choice}) meet, in rubric order
+    def quick_check_values(self, answers):
+        met = {}
+        for indicator in self.quick_indicators:
+            met[indicator.id] = (answers.get(indicator.id) in indicator.met
+                                 and (indicator.requires is None or met[indicator.requires]))
+        return [met[indicator.id] for indicator in self.quick_indicators]
+
+
+def _quick_indicator(ind, where, earlier_ids):
+    _require(isinstance(ind, dict), f"{where} must be an object")
+    choices = ind.get("choices", ["No", "Yes"])
+    met = ind.get("met", ["Yes"])
+    _require(isinstance(choices, list) and len(choices) > 1 and all(isinstance(c, str) for c in choices),
+             f"{where} choices must be a list of at least two strings")
+    _require(isinstance(met, list) and met and all(m in choices for m in met), f"{where} met must list some of its choices")
+    requires = ind.get("requires")
+    # Earlier questions only, so dependencies resolve in one pass and never form a cycle
+    _require(requires is None or requires in earlier_ids, f"{where} requires must name an earlier quick indicator")
+    return Indicator(_text(ind, "id", where), _text(ind, "label", where), ind.get("help", ""), _weight(ind, where),
+                     choices, met, requires)
+
+
+def _dimension(item, index):
+    where = f"dimension {index + 1}"
+    _require(isinstance(item, dict), f"{where} must be an object")
+    title = _text(item, "title", where)
+    where = f"dimension {title!r}"
+    key = _text(item, "key", where)
+    _require(key.isidentifier(), f"{where} key must be a Python identifier")
+    prompt = _text(item, "prompt", where)
+
+    subcomponents = []
+    _require(isinstance(item.get("subcomponents"), list) and item["subcomponents"], f"{where} needs a non-empty subcomponents list")
+    for i, sub in enumerate(item["subcomponents"], 1):
+        _require(isinstance(sub, dict), f"{where} subcomponent {i} must be an object")
+        name = _text(sub, "name", f"{where} subcomponent {i}")
+        # The AI replies with "(n) Name: score" lines, so the prompt must number the subcomponents the same way
+        _require(f"({i}) {name}" in prompt, f"{where} prompt must list subcomponent {i} as '({i}) {name}'")
+        subcomponents.append(Subcomponent(name, _weight(sub, f"{where} subcomponent {name!r}"), sub.get("query") or name))
+    _require(len({s.name for s in subcomponents}) == len(subcomponents), f"{where} has duplicate subcomponent names")
+
+    indicators = []
+    _require(isinstance(item.get("indicators"), list) and item["indicators"], f"{where} needs a non-empty indicators list")
+    for i, ind in enumerate(item["indicators"], 1):
+        _require(isinstance(ind, dict), f"{where} indicator {i} must be an object")
+        ind_where = f"{where} indicator {i}"
+        indicators.append(Indicator(_text(ind, "id", ind_where), _text(ind, "label", ind_where),
+                                    ind.get("help", ""), _weight(ind, ind_where)))
+
+    quick_indicators = []
+    _require(isinstance(item.get("quick_indicators", []), list), f"{where} quick_indicators must be a list")
+    for i, ind in enumerate(item.get("quick_indicators", []), 1):
+        quick_indicators.append(_quick_indicator(ind, f"{where} quick indicator {i}", [q.id for q in quick_indicators]))
+
+    token_budget = item.get("token_budget")
+    _require(token_budget is None or (isinstance(token_budget, int) and not isinstance(token_budget, bool) and token_budget > 0),
+             f"{where} token_budget must be a positive integer")
+
+    return Dimension(title, key, _weight(item, where), prompt, item.get("narrative_help", ""),
+                     item.get("upload_help", ""), subcomponents, indicators, quick_indicators, token_budget)
+
+
+class Rubric:
+    def __init__(self, data):
+        _require(isinstance(data, dict), "rubric must be a JSON object")
+        scale = data.get("subcomponent_scale", {})
+        _require(isinstance(scale, dict), "subcomponent_scale must be an object")
+        self.min_score = scale.get("min", 0)
+        self.max_score = scale.get("max", 3)
+        _require(all(isinstance(v, int) and not isinstance(v, bool) for v in (self.min_score, self.max_score))
+                 and self.min_score < self.max_score, "subcomponent_scale needs integer min < max")
+        # Quick-check score: base plus the weights of the indicators met, capped at max
+        quick_scale = data.get("quick_check_scale", {})
+        _require(isinstance(quick_scale, dict), "quick_check_scale must be an object")
+        self.quick_base = quick_scale.get("base", 0)
+        self.quick_max = quick_scale.get("max", self.max_score + 1)
+        _require(all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (self.quick_base, self.quick_max))
+                 and self.quick_base < self.quick_max, "quick_check_scale needs numeric base < max")
+        _require(isinstance(data.get("dimensions"), list) and data["dimensions"], "rubric needs a non-empty dimensions list")
+        self.dimensions = [_dimension(item, i) for i, item in enumerate(data["dimensions"])]
+        for field in ("title", "key"):
+            values = [getattr(d, field) for d in self.dimensions]
+            _require(len(set(values)) == len(values), f"dimension {field}s must be unique")
+        ids = [indicator.id for d in self.dimensions for indicator in d.indicators + d.quick_indicators]
+        _require(len(set(ids)) == len(ids), "indicator ids must be unique across dimensions")
+        self.by_title = {d.title: d for d in self.dimensions}
+        self.by_key = {d.key: d for d in self.dimensions}
+
+    # Combined score of one assessment from {title: score}, without loading the engine;
+    # dimensions not scored count as 0
+    def combine(self, scores):
+        total_weight = sum(d.weight for d in self.dimensions)
+        return sum(scores.get(d.title, 0) * d.weight for d in self.dimensions) / total_weight
+
+    @functools.cached_property
+    def engine(self):
+        return ScoringEngine(self)
+
+
+def load_rubric(path=RUBRIC_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise RubricError(f"cannot read rubric {path}: {e}")
+    return Rubric(data)
+
+
+# The process-wide rubric, loaded and validated on first use
+@functools.lru_cache(maxsize=None)
+def get_rubric(path=RUBRIC_PATH):
+    return load_rubric(path)
+
+
+# Array-backed scoring for a Rubric.
+# Indicator and subcomponent vectors are laid out dimension by dimension in rubric order;
+# indicator_ids and subcomponent_ids give the column order. Every method takes one vector or
+# an (n, columns) matrix and returns one row of results per input row.
+class ScoringEngine:
+    def __init__(self, rubric):
+        import numpy as np
+        self.titles = [d.title for d in rubric.dimensions]
+        self.indicator_ids = [i.id for d in rubric.dimensions for i in d.indicators]
+        self.subcomponent_ids = [(d.title, s.name) for d in rubric.dimensions for s in d.subcomponents]
+        # (columns, dimensions) weight matrices; a column only carries weight in its own dimension
+        self.indicator_weights = np.zeros((len(self.indicator_ids), len(self.titles)))
+        self.subcomponent_weights = np.zeros((len(self.subcomponent_ids), len(self.titles)))
+        self.indicator_slices = {}
+        self.subcomponent_slices = {}
+        row = sub_row = 0
+        for col, d in enumerate(rubric.dimensions):
+            self.indicator_slices[d.title] = slice(row, row + len(d.indicators))
+            for indicator in d.indicators:
+                self.indicator_weights[row, col] = indicator.weight
+                row += 1
+            self.subcomponent_slices[d.title] = slice(sub_row, sub_row + len(d.subcomponents))
+            for sub in d.subcomponents:
+                self.subcomponent_weights[sub_row, col] = sub.weight
+                sub_row += 1
+        self.quick_indicator_ids = [i.id for d in rubric.dimensions for i in d.quick_indicators]
+        self.quick_indicator_weights = np.zeros((len(self.quick_indicator_ids), len(self.titles)))
+        self.quick_indicator_slices = {}
+        row = 0
+        for col, d in enumerate(rubric.dimensions):
+            self.quick_indicator_slices[d.title] = slice(row, row + len(d.quick_indicators))
+            for indicator in d.quick_indicators:
+                self.quick_indicator_weights[row, col] = indicator.weight
+                row += 1
+        self.dimension_weights = np.array([d.weight for d in rubric.dimensions])
+        self.min_score = rubric.min_score
+        self.max_score = rubric.max_score
+        self.quick_base = rubric.quick_base
+        self.quick_max = rubric.quick_max
+
+    @staticmethod
+    def _matrix(values, columns):
+        import numpy as np
+        matrix = np.asarray(values, dtype=float)
+        single = matrix.ndim == 1
+        matrix = np.atleast_2d(matrix)
+        if matrix.shape[1] != columns:
+            raise ValueError(f"expected {columns} columns, got {matrix.shape[1]}")
+        return matrix, single
+
+    # Manual scores: weighted count of indicators met (1/True) per dimension
+    def score_indicators(self, values):
+        matrix, single = self._matrix(values, len(self.indicator_ids))
+        scores = matrix @ self.indicator_weights
+        return scores[0] if single else scores
+
+    # One dimension's manual score from its own indicators, in rubric order
+    def score_dimension_indicators(self, title, values):
+        import numpy as np
+        weights = self.indicator_weights[self.indicator_slices[title], self.titles.index(title)]
+        return float(np.asarray(values, dtype=float) @ weights)
+
+    # Quick-check scores: the base plus the weighted count of quick indicators met, capped at the maximum
+    def score_quick_check(self, values):
+        import numpy as np
+        matrix, single = self._matrix(values, len(self.quick_indicator_ids))
+        scores = np.minimum(self.quick_base + matrix @ self.quick_indicator_weights, self.quick_max)
+        return scores[0] if single else scores
+
+    # One dimension's quick-check score from Dimension.quick_check_values
+    def score_dimension_quick_check(self, title, values):
+        import numpy as np
+        weights = self.quick_indicator_weights[self.quick_indicator_slices[title], self.titles.index(title)]
+        return float(min(self.quick_base + np.asarray(values, dtype=float) @ weights, self.quick_max))
+
+    # AI scores: weighted mean of subcomponent scores per dimension. NaN marks a missing
+    # score, which is left out of its dimension's mean; a dimension with none is NaN.
+    def score_subcomponents(self, values):
+        import numpy as np
+        matrix, single = self._matrix(values, len(self.subcomponent_ids))
+        present = ~np.isnan(matrix)
+        if ((matrix[present] < self.min_score) | (matrix[present] > self.max_score)).any():
+            raise ValueError(f"subcomponent scores must be {self.min_score}–{self.max_score}")
+        totals = np.where(present, matrix, 0.0) @ self.subcomponent_weights
+        weights = present @ self.subcomponent_weights
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = np.where(weights > 0, totals / weights, np.nan)
+        return scores[0] if single else scores
+
+    # One dimension's AI score from its own subcomponent scores, in rubric order
+    def score_dimension_subcomponents(self, title, values):
+        import numpy as np
+        weights = self.subcomponent_weights[self.subcomponent_slices[title], self.titles.index(title)]
+        return float(np.asarray(values, dtype=float) @ weights / weights.sum())
+
+    # Combined score: weighted mean of dimension scores (columns in rubric order)
+    def combine(self, dimension_scores):
+        matrix, single = self._matrix(dimension_scores, len(self.titles))
+        combined = matrix @ self.dimension_weights / self.dimension_weights.sum()
+        return combined[0] if single else combined
+
+    # Indicator matrix from records mapping indicator id to met/not met; missing ids count as not met
+    def indicator_matrix(self, records):
+        import numpy as np
+        columns = {indicator_id: i for i, indicator_id in enumerate(self.indicator_ids)}
+        matrix = np.zeros((len(records), len(columns)))
+        for row, record in enumerate(records):
+            for indicator_id, value in record.items():
+                if indicator_id in columns:
+                    matrix[row, columns[indicator_id]] = float(value)
+        return matrix
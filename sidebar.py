@@ -9,6 +9,10 @@ import docx
 from io import BytesIO
 import re
 import time
+from rubric import get_rubric
+
+# Dimensions, indicators, weights and help texts
+RUBRIC = get_rubric()
 
 # Set OpenAI API key using environment variable
 api_key = os.getenv("OPENAI_API_KEY")
@@ -194,21 +198,10 @@ def ai_scoring_tab(title, prompt, key):
     use_ai = st.checkbox(f"Use AI to score {title}", value=False, key=f"ai_{key}")
     if use_ai:
         narrative = st.session_state.dimension_inputs.setdefault(f"text_{key}", "")
-        narrative_help_text = {
-            "env": "Describe national climate strategies, policy commitments, financing targets, and stakeholder consultation practices.",
-            "infra": "Describe physical infrastructure, climate data systems, digital platforms, and regulatory frameworks supporting climate goals.",
-            "providers": "Describe the role and engagement of public, private, DFI, and multilateral actors in providing climate finance.",
-            "seekers": "Describe quality of project proposals, project pipelines, accessibility of finance, and stakeholder inclusion in project development."
-        }
-        narrative = st.text_area("Enter narrative description:", height=300, value=narrative, help=narrative_help_text.get(key, "Provide relevant information."))
+        dimension = RUBRIC.by_key[key]
+        narrative = st.text_area("Enter narrative description:", height=300, value=narrative, help=dimension.narrative_help or "Provide relevant information.")
         st.session_state.dimension_inputs[f"text_{key}"] = narrative
-        upload_help_text = {
-            "env": "Upload relevant documents such as NDCs, national climate policies, and climate finance strategies.",
-            "infra": "Upload documents such as infrastructure assessments, digital platform documentation, or data monitoring reports.",
-            "providers": "Upload reports showing participation of public/private finance institutions or MDB/DFI engagement.",
-            "seekers": "Upload project concept notes, funding proposals, or stakeholder engagement reports."
-        }
-        uploaded_file = st.file_uploader("Upload document (PDF/DOCX)", type=["pdf", "docx"], key=f"file_{key}", help=upload_help_text.get(key, "Upload supporting evidence."))
+        uploaded_file = st.file_uploader("Upload document (PDF/DOCX)", type=["pdf", "docx"], key=f"file_{key}", help=dimension.upload_help or "Upload supporting evidence.")
         if uploaded_file:
             file_text = extract_text_from_file(uploaded_file)
             narrative += file_text
@@ -226,36 +219,10 @@ def ai_scoring_tab(title, prompt, key):
                     st.session_state.dimension_scores[title] = 2
     else:
         st.markdown("### Manual Scoring (based on sub-indicator evidence)")
+        # Indicators, their help texts and weights come from the rubric
+        dimension = RUBRIC.by_title[title]
         checkbox_list = []
-
-        if title == "Enabling Environment":
-            keys_labels = [
-                (f"{key}_env_s1", "Country has submitted an NDC", "The country has formally submitted its Nationally Determined Contribution to the UNFCCC."),
-                (f"{key}_env_s2", "NDC is linked to investment or implementation plans", "The NDC includes clear links to how implementation or financing will be achieved."),
-                (f"{key}_env_s3", "NDC or strategy includes financing targets or mechanisms", "The document outlines financial goals, instruments, or specific funding mechanisms."),
-                (f"{key}_env_s4", "There is a national climate finance strategy or roadmap", "A dedicated national plan or roadmap guides domestic and international climate finance efforts.")
-            ]
-        elif title == "Ecosystem Infrastructure":
-            keys_labels = [
-                (f"{key}_infra_s1", "Physical infrastructure for climate adaptation and mitigation exists", "Infrastructure such as sea walls, renewable energy plants, or forest buffers are operational."),
-                (f"{key}_infra_s2", "There is a national or regional data infrastructure for monitoring climate impacts", "Data systems exist to track climate vulnerabilities, emissions, or adaptation needs."),
-                (f"{key}_infra_s3", "Climate-related digital platforms are available for stakeholders", "Platforms share climate data or facilitate finance access for implementers."),
-                (f"{key}_infra_s4", "Regulatory frameworks for climate finance and development are in place", "Climate finance and low-carbon development are supported by enforceable regulations.")
-            ]
-        elif title == "Finance Providers":
-            keys_labels = [
-                (f"{key}_prov_s1", "Public finance providers are operational and engaged in climate finance", "Government ministries or national funds disburse climate-targeted finance."),
-                (f"{key}_prov_s2", "Private finance providers are actively engaged in climate finance", "Commercial banks or private investors participate in climate-aligned investments."),
-                (f"{key}_prov_s3", "Development finance institutions provide substantial climate finance", "Institutions like regional or bilateral DFIs fund adaptation or mitigation projects."),
-                (f"{key}_prov_s4", "Multilateral development banks are active in the climate finance ecosystem", "MDBs such as the World Bank or ADB provide loans or grants for climate action.")
-            ]
-        elif title == "Finance Seekers":
-            keys_labels = [
-                (f"{key}_seek_s1", "Project proposals are well developed and aligned with climate finance needs", "Proposals are technically sound and reflect country or sectoral climate goals."),
-                (f"{key}_seek_s2", "A pipeline of climate projects is available for financing", "There is a prioritized list of climate projects ready for donor or investor review."),
-                (f"{key}_seek_s3", "There is easy access to finance for climate-related projects", "Barriers to entry for communities or local governments are minimal."),
-                (f"{key}_seek_s4", "Stakeholder engagement is integral to project development", "Project beneficiaries are consulted and reflected in design and implementation.")
-            ]
+        keys_labels = [(f"{key}_{indicator.id}", indicator.label, indicator.help) for indicator in dimension.indicators]
 
         for k, label, tip in keys_labels:
             st.session_state.dimension_inputs.setdefault(k, False)
@@ -263,10 +230,11 @@ def ai_scoring_tab(title, prompt, key):
             st.session_state.dimension_inputs[k] = val
             checkbox_list.append(val)
 
-        score = sum([int(bool(x)) for x in checkbox_list])
+        score = RUBRIC.engine.score_dimension_indicators(title, checkbox_list)
+        score = int(score) if score.is_integer() else round(score, 2)
         st.session_state.dimension_scores[title] = score
         colored_score, maturity_label = get_colored_score(score)
-        st.markdown(f"**Score for {title}:** {colored_score}/4 – _{maturity_label}_", unsafe_allow_html=True)
+        st.markdown(f"**Score for {title}:** {colored_score}/{dimension.max_indicator_score:g} – _{maturity_label}_", unsafe_allow_html=True)
 
         flag_map = {
             "env": "env_done",
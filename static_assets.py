@@ -0,0 +1,33 @@
+import base64
+import os
+from functools import lru_cache
+
+# Bundled static assets (logo and CSS), read from the checkout once per process and
+# served from memory, so rendering never depends on network access.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(ROOT, "assets")
+LOGO_PATH = os.path.join(ROOT, "Chemonics_RGB_Horizontal_BLUE-WHITE.png")
+
+
+@lru_cache(maxsize=None)
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def logo_bytes():
+    return _read_bytes(LOGO_PATH)
+
+
+# For HTML blocks that need an <img> tag rather than st.image
+@lru_cache(maxsize=1)
+def logo_data_uri():
+    return "data:image/png;base64," + base64.b64encode(logo_bytes()).decode("ascii")
+
+
+# A CSS file from assets/ wrapped in a <style> tag, ready for st.markdown(..., unsafe_allow_html=True)
+@lru_cache(maxsize=None)
+def style_block(name):
+    css = _read_bytes(os.path.join(ASSETS_DIR, f"{name}.css")).decode("utf-8")
+    return f"<style>\n{css}</style>\n"
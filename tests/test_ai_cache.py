@@ -0,0 +1,43 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai_cache import ResponseCache, cache_key  # noqa: E402
+
+
+def test_key_depends_on_model_prompt_and_input():
+    key = cache_key("gpt-4o", "Score it.", "Narrative")
+    assert key == cache_key("gpt-4o", "Score it.", "Narrative")
+    assert key != cache_key("gpt-4o-mini", "Score it.", "Narrative")
+    assert key != cache_key("gpt-4o", "Score it again.", "Narrative")
+    assert key != cache_key("gpt-4o", "Score it.", "Other narrative")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats == {"memory_hits": 3, "disk_hits": 0, "misses": 1}
+
+
+def test_entries_survive_on_disk(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(db_path=path).set("a", "1")
+    cache = ResponseCache(db_path=path)
+    assert cache.get("a") == "1"
+    assert cache.get("a") == "1"
+    assert cache.stats["disk_hits"] == 1 and cache.stats["memory_hits"] == 1
+
+
+def test_clear_removes_memory_and_disk_entries(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "responses.sqlite3"))
+    cache.set("a", "1")
+    cache.clear()
+    assert cache.get("a") is None
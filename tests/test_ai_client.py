@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ai_client  # noqa: E402
+from ai_client import AIClient, RateLimiter, RequestCoalescer  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ai_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ai_client.time, "sleep", clock.sleep)
+    return clock
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after}) if retry_after is not None else None
+
+
+def _reply(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+
+
+class FlakyClient:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return _reply("ok")
+
+
+MESSAGES = [{"role": "user", "content": "Score this."}]
+
+
+def test_requests_per_minute_bucket_waits_for_refill(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_tokens_per_minute_bucket_caps_oversized_requests(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    # A request larger than the whole bucket takes it all rather than waiting forever
+    limiter.acquire(5000)
+    assert clock.sleeps == []
+    limiter.acquire(500)
+    assert sum(clock.sleeps) == pytest.approx(30.0)
+
+
+def test_disabled_limiter_never_waits(clock):
+    limiter = RateLimiter()
+    for _ in range(1000):
+        limiter.acquire(10_000)
+    assert clock.sleeps == []
+
+
+def test_retryable_errors_back_off_until_success(clock):
+    client = FlakyClient([StatusError(429), StatusError(503)])
+    ai = AIClient(client, max_retries=5, base_delay=1.0, max_delay=30.0)
+    assert ai.complete("gpt-4o", MESSAGES) == "ok"
+    assert client.calls == 3
+    assert ai.retries == 2
+    # Full jitter: each delay is within the exponential cap of its attempt
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 1.0 and 0 <= clock.sleeps[1] <= 2.0
+
+
+def test_retry_after_header_sets_the_delay(clock):
+    client = FlakyClient([StatusError(429, retry_after="7"), StatusError(429, retry_after="120")])
+    ai = AIClient(client, max_delay=30.0)
+    ai.complete("gpt-4o", MESSAGES)
+    assert clock.sleeps == [7.0, 30.0]
+
+
+def test_non_retryable_and_exhausted_errors_are_raised(clock):
+    client = FlakyClient([StatusError(400)])
+    with pytest.raises(StatusError):
+        AIClient(client).complete("gpt-4o", MESSAGES)
+    assert client.calls == 1
+
+    client = FlakyClient([StatusError(500)] * 3)
+    with pytest.raises(StatusError):
+        AIClient(client, max_retries=2).complete("gpt-4o", MESSAGES)
+    assert client.calls == 3
+
+
+def test_identical_concurrent_requests_share_one_call():
+    coalescer = RequestCoalescer()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "shared"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(coalescer.run("key", slow)))
+    owner.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(coalescer.run("key", slow))) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    while coalescer.coalesced < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+    assert results == ["shared"] * 4
+    assert len(calls) == 1
+    # Once finished, the same key calls again
+    assert coalescer.run("key", lambda: "fresh") == "fresh"
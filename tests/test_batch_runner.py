@@ -0,0 +1,66 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai_cache import ResponseCache  # noqa: E402
+from ai_client import AIClient, RateLimiter  # noqa: E402
+from batch_runner import NO_INPUT, BatchRunner, Checkpoint  # noqa: E402
+from cfed_scoring import DIMENSIONS, Scorer  # noqa: E402
+from llm_backends import MockLLM  # noqa: E402
+
+COUNTRIES = [{"country": "Kenya", "narratives": {"env": "Kenya has a climate finance unit in the treasury."}, "documents": {}}]
+
+
+def _runner(llm, **kwargs):
+    scorer = Scorer(AIClient(lambda: llm, RateLimiter(0, 0)), ResponseCache(max_entries=0), "gpt-4o", {})
+    return BatchRunner(scorer, **kwargs)
+
+
+def test_assess_all_rerun_skips_dimensions_without_input(tmp_path):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    llm = MockLLM(latency=0, token_latency=0)
+    rows = _runner(llm, assess_all=True).run(COUNTRIES, Checkpoint(path))
+    assert len(rows) == len(DIMENSIONS)
+    assert sum(row["error"] == NO_INPUT for row in rows) == len(DIMENSIONS) - 1
+    first_calls = llm.calls
+
+    rerun = _runner(llm, assess_all=True).run(COUNTRIES, Checkpoint(path))
+    assert llm.calls == first_calls
+    assert rerun == rows
+
+
+class FlakyRecommendations(MockLLM):
+    def __init__(self):
+        super().__init__(latency=0, token_latency=0)
+        self.fail = True
+        self.prompts = []
+
+    def reply(self, model, messages, response_format=None):
+        recommendations = "recommendations for improving" in messages[0]["content"]
+        self.prompts.append("recommendations" if recommendations else "score")
+        if recommendations and self.fail:
+            raise RuntimeError("recommendations unavailable")
+        return super().reply(model, messages, response_format)
+
+
+def test_rerun_retries_only_failed_recommendations(tmp_path):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    countries = [{"country": "Kenya", "narratives": {key: "A national climate finance strategy is in draft." for _, key, _ in DIMENSIONS},
+                  "documents": {}}]
+    llm = FlakyRecommendations()
+    rows = _runner(llm).run(countries, Checkpoint(path))
+    failed = [row for row in rows if row["error"]]
+    assert failed and all(row["score"] is not None and row["score"] < 4 for row in failed)
+
+    llm.fail = False
+    llm.prompts.clear()
+    rerun = _runner(llm).run(countries, Checkpoint(path))
+    assert llm.prompts == ["recommendations"] * len(failed)
+    assert not any(row["error"] for row in rerun)
+    assert [row["score"] for row in rerun] == [row["score"] for row in rows]
+    # The retried rows are checkpointed, so a third run has nothing left to do
+    llm.prompts.clear()
+    _runner(llm).run(countries, Checkpoint(path))
+    assert llm.prompts == []
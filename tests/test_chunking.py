@@ -0,0 +1,64 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chunking import (REDUCE_INSTRUCTIONS, STRUCTURED_REDUCE_INSTRUCTIONS, count_tokens,  # noqa: E402
+                      dimension_token_budget, prepare_reduce, split_by_tokens)
+
+PARAGRAPHS = [f"Paragraph {i} describes climate finance commitments and pipeline projects." for i in range(40)]
+TEXT = "\n".join(PARAGRAPHS)
+
+
+def test_chunks_stay_within_the_limit_and_keep_paragraphs_whole():
+    chunks = split_by_tokens(TEXT, 50)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert [line for chunk in chunks for line in chunk.split("\n")] == PARAGRAPHS
+
+
+def test_oversized_paragraph_is_split():
+    chunks = split_by_tokens("word " * 400, 50)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+
+
+class Recorder:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt, text):
+        self.prompts.append(prompt)
+        return "(1) Strategy: 2"
+
+
+def test_short_input_passes_through():
+    score = Recorder()
+    assert prepare_reduce("Score it.", "Short narrative.", score) == ("Score it.", "Short narrative.")
+    assert score.prompts == []
+
+
+def test_long_input_is_mapped_within_the_budget():
+    score = Recorder()
+    prompt, combined = prepare_reduce("Score it.", TEXT, score, chunk_tokens=50, token_budget=150)
+    assert len(score.prompts) == 3
+    assert prompt == "Score it." + REDUCE_INSTRUCTIONS
+    assert combined.count("(1) Strategy: 2") == 3
+
+
+def test_structured_reduce_does_not_ask_for_score_lines():
+    score = Recorder()
+    prompt, _ = prepare_reduce("Reply with JSON.", TEXT, score, chunk_tokens=50, token_budget=150, structured=True)
+    assert prompt == "Reply with JSON." + STRUCTURED_REDUCE_INSTRUCTIONS
+    assert all("plain text rather than JSON" in map_prompt for map_prompt in score.prompts)
+
+
+def test_failed_map_calls_return_the_error():
+    prompt, output = prepare_reduce("Score it.", TEXT, lambda p, t: "AI error: unavailable", chunk_tokens=50)
+    assert prompt == "Score it."
+    assert output == "AI error: unavailable"
+
+
+def test_token_budget_adds_up_per_dimension():
+    assert dimension_token_budget("env", "infra") == dimension_token_budget("env") + dimension_token_budget("infra")
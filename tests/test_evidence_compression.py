@@ -0,0 +1,79 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from evidence_compression import PAGE_BREAK, compress_evidence  # noqa: E402
+
+# Regression cases for evidence compression: figures in tables must survive, while running
+# headers and page numbers at page boundaries are removed.
+
+HEADER = "Ministry of Finance Climate Finance Report"
+TABLE = ["2019", "120", "340", "2020", "150", "410",
+         "Total committed 2021 450", "Total committed 2022 500", "Total committed 2023 620"]
+# Entries of a project list, each with the same short status labels
+ENTRIES = [f"Project {name}\nStatus: Approved\nCo-financing from GCF\nBudget of {amount} million for adaptation."
+           for name, amount in (("Alpha", 12), ("Beta", 30), ("Gamma", 45))]
+
+
+def pages(*bodies):
+    return PAGE_BREAK.join(bodies)
+
+
+def test_numeric_table_lines_are_kept():
+    text = pages(
+        "\n".join([HEADER, "Table 3: Climate finance committed by year (USD million)"] + TABLE[:3] + ["1"]),
+        "\n".join([HEADER] + TABLE[3:6] + ["2"]),
+        "\n".join([HEADER] + TABLE[6:] + ["3"]),
+    )
+    compressed, stats = compress_evidence(text, enabled=True)
+    lines = compressed.splitlines()
+    for line in TABLE:
+        assert line in lines
+    assert HEADER not in lines
+    assert not {"1", "2", "3"} & set(lines)
+    assert stats.furniture_lines == 6
+
+
+def test_year_opening_a_page_is_not_a_page_number():
+    text = pages("Commitments by year\n2019\n120", "2020\n150\nEnd of table")
+    compressed, _ = compress_evidence(text, enabled=True)
+    assert compressed.splitlines() == ["Commitments by year", "2019", "120", "2020", "150", "End of table"]
+
+
+def test_numbers_inside_a_page_are_kept():
+    text = pages("Funding rounds\n1\n2\n3\nclosed in 2023")
+    compressed, _ = compress_evidence(text, enabled=True)
+    assert compressed.splitlines() == ["Funding rounds", "1", "2", "3", "closed in 2023"]
+
+
+def test_repeated_figures_are_not_furniture():
+    rows = ["Total committed 2021 450"] * 4
+    compressed, stats = compress_evidence("\n".join(["Committed finance"] + rows), enabled=True)
+    assert compressed.splitlines().count("Total committed 2021 450") == 4
+    assert stats.furniture_lines == 0
+
+
+def test_disabled_compression_only_replaces_page_breaks():
+    compressed, stats = compress_evidence(pages("first page", "second page"), enabled=False)
+    assert compressed == "first page\nsecond page"
+    assert stats.tokens_before == stats.tokens_after
+
+
+def test_repeated_labels_in_text_without_page_breaks_are_kept():
+    # DOCX text has no page breaks, so nothing can be a running header or footer
+    compressed, stats = compress_evidence("\n\n".join(ENTRIES), enabled=True)
+    lines = compressed.splitlines()
+    assert lines.count("Status: Approved") == 3
+    assert lines.count("Co-financing from GCF") == 3
+    assert stats.furniture_lines == 0
+
+
+def test_repeated_labels_inside_pages_are_kept():
+    text = pages(*("\n".join([HEADER, entry, str(page)]) for page, entry in enumerate(ENTRIES, 1)))
+    compressed, stats = compress_evidence(text, enabled=True)
+    lines = compressed.splitlines()
+    assert lines.count("Status: Approved") == 3
+    assert HEADER not in lines
+    assert stats.furniture_lines == 6
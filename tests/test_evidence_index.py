@@ -0,0 +1,35 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from evidence_index import EvidenceIndex  # noqa: E402
+
+TEXT = "\n".join(f"Passage {i} on climate finance strategy and project pipelines. " * 20 for i in range(20))
+
+
+def embed(width):
+    def embed_fn(texts):
+        return [[float(len(text) % (i + 2)) + 1.0 for i in range(width)] for text in texts]
+    return embed_fn
+
+
+def test_concurrent_writers_of_one_document(tmp_path):
+    def index_once(_):
+        index = EvidenceIndex(embed(8), "model", index_dir=str(tmp_path), backend="mock")
+        index.add_document("digest", TEXT)
+        return len(index.retrieve(["digest"], ["strategy"]))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(list(pool.map(index_once, range(16))))
+    assert sorted(os.listdir(tmp_path)) == ["digest-mock-model.json", "digest-mock-model.npy"]
+
+
+def test_matrix_of_another_width_is_embedded_again(tmp_path):
+    EvidenceIndex(embed(8), "model", index_dir=str(tmp_path), backend="mock").add_document("digest", TEXT)
+    index = EvidenceIndex(embed(16), "model", index_dir=str(tmp_path), backend="mock")
+    index.add_document("digest", TEXT)
+    assert index.retrieve(["digest"], ["strategy"])
+    assert index._segments["digest"][0].shape[1] == 16
@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import job_queue  # noqa: E402
+from job_queue import JobQueue  # noqa: E402
+
+
+def _echo(job, value, gate=None):
+    if gate is not None:
+        gate.wait(5)
+    job.progress = f"working on {value}"
+    return value
+
+
+# finished is set by a done callback, which may run just after result() returns
+def _wait(job):
+    job.future.result(5)
+    while job.finished is None:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(workers=2, ttl=60)
+
+
+def test_same_key_shares_one_job_across_sessions_and_reruns(queue):
+    gate = threading.Event()
+    calls = []
+
+    def fn(job):
+        calls.append(job.key)
+        gate.wait(5)
+        return "done"
+
+    first = queue.submit("a", "score:env", "key", fn)
+    assert queue.submit("a", "score:env", "key", fn) is first
+    assert queue.submit("b", "score:env", "key", fn) is first
+    assert queue.running("a") == ["score:env"] and queue.running("b") == ["score:env"]
+    gate.set()
+    _wait(first)
+    assert first.result() == "done"
+    assert calls == ["key"]
+    assert queue.running("a") == []
+
+
+def test_failed_job_keeps_its_exception(queue):
+    def fail(job):
+        raise RuntimeError("boom")
+
+    job = queue.submit("a", "score:env", "key", fail)
+    job.future.exception(5)
+    assert isinstance(job.exception(), RuntimeError)
+    with pytest.raises(RuntimeError):
+        job.result()
+
+
+def test_forget_reruns_a_finished_job_only(queue):
+    gate = threading.Event()
+    job = queue.submit("a", "slot", "key", _echo, 1, gate)
+    # Still running: forgetting it would start a duplicate
+    queue.forget("key")
+    assert queue.submit("a", "slot", "key", _echo, 2) is job
+    gate.set()
+    assert job.future.result(5) == 1
+    queue.forget("key")
+    again = queue.submit("a", "slot", "key", _echo, 2)
+    assert again is not job and again.id != job.id
+    assert again.future.result(5) == 2
+    assert again.progress == "working on 2"
+
+
+def test_release_only_drops_the_session_slot(queue):
+    job = queue.submit("a", "slot", "key", _echo, 1)
+    queue.submit("b", "slot", "key", _echo, 1)
+    job.future.result(5)
+    queue.release("a", "slot")
+    assert queue.get("a", "slot") is None
+    assert queue.get("b", "slot") is job
+    assert queue.session_jobs("b") == {"slot": job}
+
+
+def test_finished_jobs_expire_after_the_ttl(queue, monkeypatch):
+    job = queue.submit("a", "old", "old-key", _echo, 1)
+    _wait(job)
+    now = job.finished + queue.ttl + 1
+    monkeypatch.setattr(job_queue.time, "time", lambda: now)
+    fresh = queue.submit("a", "new", "new-key", _echo, 2)
+    assert queue.get("a", "old") is None
+    assert queue.session_jobs("a") == {"new": fresh}
+    # The expired job is gone too, so its key runs again
+    assert queue.submit("a", "old", "old-key", _echo, 3) is not job
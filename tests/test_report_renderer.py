@@ -0,0 +1,27 @@
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import report_renderer  # noqa: E402
+from report_renderer import render_scores_pdf  # noqa: E402
+
+
+def _without_date(data):
+    return re.sub(rb"/CreationDate \(D:\d+\)", b"", data)
+
+
+def test_logo_is_parsed_once_and_embedded_in_every_report():
+    report_renderer._reports.clear()
+    report_renderer._logo_image.cache_clear()
+    first = render_scores_pdf((("Enabling Environment", 2.5),), 2.5)
+    report_renderer._reports.clear()
+    second = render_scores_pdf((("Enabling Environment", 2.5),), 2.5)
+    third = render_scores_pdf((("Enabling Environment", 3.0),), 3.0)
+    assert report_renderer._logo_image.cache_info().misses == 1
+    assert second is not first and _without_date(second) == _without_date(first)
+    for data in (first, third):
+        assert data.startswith(b"%PDF-1.4")
+        assert data.count(b"/Subtype /Image") == 2  # the logo and its transparency mask
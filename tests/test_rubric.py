@@ -0,0 +1,99 @@
+import math
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rubric import Rubric, RubricError, get_rubric  # noqa: E402
+
+
+def _data():
+    return {
+        "subcomponent_scale": {"min": 0, "max": 3},
+        "quick_check_scale": {"base": 1, "max": 4},
+        "dimensions": [
+            {"title": "Policy", "key": "policy", "weight": 2,
+             "prompt": "Score (1) Strategy and (2) Budget.",
+             "subcomponents": [{"name": "Strategy", "weight": 3}, {"name": "Budget"}],
+             "indicators": [{"id": "p1", "label": "Strategy adopted", "weight": 2}, {"id": "p2", "label": "Budget tagged"}],
+             "quick_indicators": [{"id": "q1", "label": "Strategy?"},
+                                  {"id": "q2", "label": "Funded?", "choices": ["No", "Partly", "Fully"], "met": ["Partly", "Fully"],
+                                   "requires": "q1", "weight": 2}]},
+            {"title": "Markets", "key": "markets",
+             "prompt": "Score (1) Banks.",
+             "subcomponents": [{"name": "Banks"}],
+             "indicators": [{"id": "m1", "label": "Green lending"}]},
+        ],
+    }
+
+
+@pytest.fixture
+def rubric():
+    return Rubric(_data())
+
+
+def test_indicators_are_weighted_per_dimension(rubric):
+    engine = rubric.engine
+    assert engine.indicator_ids == ["p1", "p2", "m1"]
+    assert list(engine.score_indicators([1, 1, 1])) == [3, 1]
+    # A matrix scores every row in one call
+    assert engine.score_indicators([[1, 0, 0], [0, 1, 1]]).tolist() == [[2, 0], [1, 1]]
+    assert engine.score_dimension_indicators("Policy", [1, 0]) == 2
+    with pytest.raises(ValueError, match="expected 3 columns"):
+        engine.score_indicators([1, 1])
+
+
+def test_subcomponent_means_skip_missing_scores(rubric):
+    engine = rubric.engine
+    scores = engine.score_subcomponents([[3, 1, 2], [math.nan, 1, math.nan]])
+    assert scores[0].tolist() == [2.5, 2]
+    assert scores[1][0] == 1 and math.isnan(scores[1][1])
+    assert engine.score_dimension_subcomponents("Policy", [3, 1]) == 2.5
+    with pytest.raises(ValueError, match="0–3"):
+        engine.score_subcomponents([4, 0, 0])
+
+
+def test_combine_matches_the_engine_free_path(rubric):
+    assert rubric.engine.combine([3, 0]) == pytest.approx(2)
+    assert rubric.combine({"Policy": 3}) == pytest.approx(2)
+
+
+def test_quick_check_follows_requirements_and_caps(rubric):
+    policy = rubric.by_title["Policy"]
+    assert policy.quick_check_values({"q1": "Yes", "q2": "Partly"}) == [True, True]
+    # q2 counts only once q1 is met
+    assert policy.quick_check_values({"q1": "No", "q2": "Fully"}) == [False, False]
+    engine = rubric.engine
+    assert engine.score_dimension_quick_check("Policy", [True, True]) == 4
+    assert engine.score_dimension_quick_check("Policy", [False, False]) == 1
+    assert list(engine.score_quick_check([1, 0])) == [2, 1]
+
+
+def test_indicator_matrix_ignores_unknown_ids(rubric):
+    matrix = rubric.engine.indicator_matrix([{"p2": 1, "m1": 0.5, "other": 1}, {}])
+    assert matrix.tolist() == [[0, 1, 0.5], [0, 0, 0]]
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda d: d["dimensions"][0].update(prompt="Score strategy."), "must list subcomponent 1"),
+    (lambda d: d["dimensions"][1]["indicators"][0].update(id="p1"), "unique"),
+    (lambda d: d["dimensions"][0]["quick_indicators"][1].update(requires="q9"), "earlier quick indicator"),
+    (lambda d: d["dimensions"][0].update(token_budget=0), "token_budget"),
+    (lambda d: d["dimensions"][1].update(weight=-1), "positive number"),
+])
+def test_invalid_rubrics_are_rejected(change, message):
+    data = _data()
+    change(data)
+    with pytest.raises(RubricError, match=message):
+        Rubric(data)
+
+
+def test_bundled_rubric_loads():
+    rubric = get_rubric()
+    engine = rubric.engine
+    assert len(engine.titles) == len(rubric.dimensions)
+    top = [rubric.max_score] * len(engine.subcomponent_ids)
+    assert engine.score_subcomponents(top).tolist() == [rubric.max_score] * len(engine.titles)
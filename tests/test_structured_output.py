@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai_cache import ResponseCache  # noqa: E402
+from cfed_scoring import (AI_ERROR_PREFIX, DIMENSION_PROMPTS, SUBCOMPONENTS, Scorer, StructuredOutputError,  # noqa: E402
+                          extract_avg_score, format_structured_score, validate_assessment, validate_structured_score)
+
+TITLE = next(iter(SUBCOMPONENTS))
+
+
+def _reply(scores, **extra):
+    return json.dumps({"subcomponents": [{"id": i, "score": score, "rationale": f" Evidence {i}. "} for i, score in enumerate(scores, 1)],
+                       "summary": "Summary.", **extra})
+
+
+class ScriptedClient:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def complete(self, model, messages, **kwargs):
+        self.requests.append(messages)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def test_valid_reply_is_normalised():
+    count = len(SUBCOMPONENTS[TITLE])
+    scores = [2] * count
+    # Out of order, with the names left out: names come from the rubric and ids are sorted
+    raw = json.loads(_reply(scores))
+    raw["subcomponents"].reverse()
+    result = validate_structured_score(TITLE, json.dumps(raw))
+    assert [s["id"] for s in result["subcomponents"]] == list(range(1, count + 1))
+    assert [s["name"] for s in result["subcomponents"]] == SUBCOMPONENTS[TITLE]
+    assert result["subcomponents"][0]["rationale"] == "Evidence 1."
+    assert result["average"] == 2
+    assert extract_avg_score(format_structured_score(result), TITLE) == result["average"]
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("not json", "not valid JSON"),
+    ("[]", "JSON object"),
+    ('{"summary": "x"}', '"subcomponents" list'),
+    (_reply([2]), "missing subcomponents"),
+    (_reply([9] * len(SUBCOMPONENTS[TITLE])), "must be"),
+    (_reply(["high"] * len(SUBCOMPONENTS[TITLE])), "integer id and score"),
+])
+def test_invalid_replies_are_rejected(raw, message):
+    with pytest.raises(StructuredOutputError, match=message):
+        validate_structured_score(TITLE, raw)
+
+
+def test_assessment_needs_recommendations_for_every_requested_dimension():
+    dimension = json.loads(_reply([3] * len(SUBCOMPONENTS[TITLE])))
+    raw = json.dumps({"dimensions": [dict(dimension, dimension=TITLE, recommendations=["Do more."])]})
+    assert validate_assessment(raw, [TITLE])[TITLE]["recommendations"] == ["Do more."]
+    with pytest.raises(StructuredOutputError, match="missing dimensions"):
+        validate_assessment(raw)
+    raw = json.dumps({"dimensions": [dict(dimension, dimension=TITLE, recommendations=[])]})
+    with pytest.raises(StructuredOutputError, match="recommendations"):
+        validate_assessment(raw, [TITLE])
+
+
+def test_invalid_reply_is_repaired_once_with_the_error():
+    good = _reply([3] * len(SUBCOMPONENTS[TITLE]))
+    client = ScriptedClient(_reply([3]), good)
+    cache = ResponseCache(max_entries=10)
+    scorer = Scorer(client, cache)
+    result = scorer.get_structured_score(TITLE, DIMENSION_PROMPTS[TITLE], "Evidence.")
+    assert result["average"] == 3
+    repair = client.requests[1]
+    assert repair[-2] == {"role": "assistant", "content": _reply([3])}
+    assert "missing subcomponents" in repair[-1]["content"]
+    # Only the valid reply is cached, so the next call needs no request
+    assert scorer.get_structured_score(TITLE, DIMENSION_PROMPTS[TITLE], "Evidence.") == result
+    assert len(client.requests) == 2
+
+
+def test_second_invalid_reply_and_client_errors_raise():
+    client = ScriptedClient("not json", "still not json")
+    with pytest.raises(StructuredOutputError, match="not valid JSON"):
+        Scorer(client).get_structured_score(TITLE, DIMENSION_PROMPTS[TITLE], "Evidence.")
+    assert len(client.requests) == 2
+
+    client = ScriptedClient(RuntimeError("connection reset"))
+    with pytest.raises(StructuredOutputError, match=AI_ERROR_PREFIX):
+        Scorer(client).get_structured_score(TITLE, DIMENSION_PROMPTS[TITLE], "Evidence.")
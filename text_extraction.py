@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from itertools import repeat
+from xml.etree.ElementTree import iterparse
+
+from metrics import REGISTRY, stage
+from parse_cache import PARSE_CACHE, parse_key
+
+# Word files are read straight from the document XML with the standard library.
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Upload limits; pages beyond MAX_PDF_PAGES are ignored, files over MAX_UPLOAD_BYTES are rejected
+MAX_PDF_PAGES = int(os.getenv("CFED_MAX_PDF_PAGES", "500"))
+MAX_UPLOAD_BYTES = int(os.getenv("CFED_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+# PDFs with more pages than this are split into ranges and extracted in worker processes
+PAGES_PER_WORKER = int(os.getenv("CFED_PDF_PAGES_PER_WORKER", "25"))
+PDF_WORKERS = int(os.getenv("CFED_PDF_WORKERS", str(min(os.cpu_count() or 1, 8))))
+# Word files larger than this are parsed in a worker process
+DOCX_PROCESS_BYTES = int(os.getenv("CFED_DOCX_PROCESS_BYTES", str(2 * 1024 * 1024)))
+# Files extracted at once from a multi-file upload
+FILE_WORKERS = int(os.getenv("CFED_FILE_WORKERS", "4"))
+
+# Part of every parse cache key: bump it whenever a change here alters extracted text,
+# so text cached by the previous parser is not reused
+PARSER_VERSION = 2
+
+# PDF pages are separated by a form feed, so later steps can tell where each page starts and ends
+PAGE_BREAK = "\f"
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+TABLE_CELL_SEPARATOR = " | "
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+# File-like wrapper exposing the .name/.type attributes of a Streamlit UploadedFile,
+# so documents on disk go through the same extraction path as uploads
+class LocalFile(BytesIO):
+    TYPES = {".pdf": PDF_MIME, ".docx": DOCX_MIME}
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+        self.type = self.TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+# Process pool shared by every session; created on first large PDF.
+# Workers are spawned rather than forked because the Streamlit server is multi-threaded.
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _read_bytes(uploaded_file):
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    return uploaded_file.read()
+
+
+# Runs in a worker process: re-open the PDF and extract one range of pages
+def _extract_page_range(data, start, stop):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+# Yield the text of each page in order, extracting page ranges in parallel for long PDFs
+def iter_pdf_pages(data, max_pages=MAX_PDF_PAGES):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(BytesIO(data))
+    page_count = min(len(reader.pages), max_pages)
+    if PDF_WORKERS <= 1 or page_count <= 2 * PAGES_PER_WORKER:
+        for i in range(page_count):
+            yield reader.pages[i].extract_text() or ""
+        return
+    starts = range(0, page_count, PAGES_PER_WORKER)
+    stops = [min(start + PAGES_PER_WORKER, page_count) for start in starts]
+    # map() returns ranges in submission order, so pages stream out in document order
+    for pages in _get_pool().map(_extract_page_range, repeat(data), starts, stops):
+        yield from pages
+
+
+# Yield the text of each paragraph and table row of a .docx in document order.
+# The document XML is parsed incrementally and each element is cleared once read, so memory
+# stays flat however long the document is. Table rows come out as "cell | cell | cell", with
+# the paragraphs of a cell (and any nested table) joined into that cell.
+def iter_docx_blocks(data):
+    with zipfile.ZipFile(BytesIO(data)) as archive, archive.open("word/document.xml") as xml:
+        body = None
+        paragraphs = []  # stack of open paragraphs (text boxes nest them), each a list of text pieces
+        cells = []       # stack of open table cells, each a list of paragraph texts
+        rows = []        # stack of open table rows, each a list of cell texts
+        for event, elem in iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == WORD_NS + "p":
+                    paragraphs.append([])
+                elif tag == WORD_NS + "tr":
+                    rows.append([])
+                elif tag == WORD_NS + "tc":
+                    cells.append([])
+                elif tag == WORD_NS + "body":
+                    body = elem
+                continue
+            block = None
+            if tag == WORD_NS + "t" and paragraphs:
+                paragraphs[-1].append(elem.text or "")
+            elif tag == WORD_NS + "tab" and paragraphs:
+                paragraphs[-1].append("\t")
+            elif tag in (WORD_NS + "br", WORD_NS + "cr") and paragraphs:
+                paragraphs[-1].append("\n")
+            elif tag == WORD_NS + "p":
+                text = "".join(paragraphs.pop()).strip()
+                if not text:
+                    pass
+                elif paragraphs:
+                    paragraphs[-1].append(" " + text)
+                elif cells:
+                    cells[-1].append(text)
+                else:
+                    block = text
+            elif tag == WORD_NS + "tc":
+                cell = " ".join(cells.pop())
+                if rows:
+                    rows[-1].append(cell)
+            elif tag == WORD_NS + "tr":
+                line = TABLE_CELL_SEPARATOR.join(rows.pop())
+                if not line.strip(" |"):
+                    pass
+                elif cells:
+                    # Row of a nested table: it becomes part of the enclosing cell
+                    cells[-1].append(line)
+                else:
+                    block = line
+            if block is not None:
+                yield block
+            # Finished top-level blocks are dropped from the tree as we go
+            if body is not None and not paragraphs and not cells and tag in (WORD_NS + "p", WORD_NS + "tbl"):
+                body.clear()
+
+
+# Runs in a worker process for large Word files
+def _docx_text(data):
+    return "\n".join(iter_docx_blocks(data))
+
+
+# Function to extract text from uploaded file.
+# Text is looked up in the persistent parse cache first (pass cache=None to always parse).
+def extract_text_from_file(uploaded_file, max_pages=MAX_PDF_PAGES, max_bytes=MAX_UPLOAD_BYTES, cache=PARSE_CACHE):
+    data = _read_bytes(uploaded_file)
+    if len(data) > max_bytes:
+        raise DocumentTooLarge(
+            f"{getattr(uploaded_file, 'name', 'Document')} is {len(data) / 1e6:.1f} MB; "
+            f"the limit is {max_bytes / 1e6:.1f} MB."
+        )
+    key = None
+    if cache is not None and uploaded_file.type in (PDF_MIME, DOCX_MIME):
+        key = parse_key(data, uploaded_file.type, PARSER_VERSION, max_pages)
+        text = cache.get(key)
+        if text is not None:
+            return text
+    with stage("parse_document", type=uploaded_file.type, bytes=len(data)) as fields:
+        if uploaded_file.type == PDF_MIME:
+            text = PAGE_BREAK.join(iter_pdf_pages(data, max_pages))
+        elif uploaded_file.type == DOCX_MIME:
+            if len(data) > DOCX_PROCESS_BYTES and PDF_WORKERS > 1:
+                text = _get_pool().submit(_docx_text, data).result()
+            else:
+                text = _docx_text(data)
+        else:
+            text = ""
+        fields["chars"] = len(text)
+    REGISTRY.inc("cfed_parsed_bytes_total", len(data), type=uploaded_file.type)
+    if key is not None:
+        cache.set(key, text)
+    return text
+
+
+# Extract several uploads at once. Returns (text, error) pairs in input order; error is the
+# exception raised for that file (e.g. DocumentTooLarge) or None.
+def extract_texts(uploaded_files, workers=FILE_WORKERS, **kwargs):
+    def extract(uploaded_file):
+        try:
+            return extract_text_from_file(uploaded_file, **kwargs), None
+        except Exception as e:
+            return "", e
+    uploaded_files = list(uploaded_files)
+    if len(uploaded_files) <= 1 or workers <= 1:
+        return [extract(f) for f in uploaded_files]
+    with ThreadPoolExecutor(max_workers=min(workers, len(uploaded_files))) as pool:
+        return list(pool.map(extract, uploaded_files))